@@ -0,0 +1,138 @@
+"""Timings and peak memory of the contacts book hot paths.
+
+   For every book size a synthetic book is generated, then search,
+   coming birthday, show all, save and load are timed (the best of
+   --repeat runs) and their peak memory is measured with tracemalloc in a
+   separate run, because tracing slows the code down. Results are printed
+   as a table and written as JSON together with the current git commit, so
+   runs of different commits can be compared.
+
+   Run from the folder with setup.py:
+       python -m benchmarks.bench_contacts --sizes 1000 10000 100000 1000000
+       python -m benchmarks.bench_contacts --storage db --output db.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from personal_helper import personal_helper as ph
+
+from .synthetic import fake_states
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def consume(result):
+    # Команды могут возвращать итератор, который нужно дочитать до конца
+    if isinstance(result, str):
+        return len(result)
+    return sum(len(chunk) for chunk in result)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_book(size, file_name):
+    book = ph.AddressBook()
+    book.load_from_file(file_name)
+    book.add_records(ph.Record.from_state(state) for state in fake_states(size))
+    book.save_to_file(file_name)
+    return book
+
+
+def operations(book, file_name):
+    some = next(iter(book.keys()))
+
+    def save_one_change():
+        book.get_record(some).address = f'Kyiv, {time.perf_counter()}'
+        book.save_to_file(file_name)
+
+    def load():
+        ph.AddressBook().load_from_file(file_name)
+
+    # Порядок важен: первый поиск строит индекс, следующие им пользуются
+    return [
+        ('search (builds index)', lambda: consume(book.search('shevchenko 1'))),
+        ('search', lambda: consume(book.search('shevchenko 1'))),
+        ('search --limit 10', lambda: consume(book.search('kyiv', 10))),
+        ('coming birthday 365', lambda: ph.coming_birthday(['365'])),
+        ('show all 1', lambda: consume(ph.show_all(['1']))),
+        ('show all', lambda: consume(ph.show_all([]))),
+        ('save one change', save_one_change),
+        ('load', load),
+    ]
+
+
+def run(sizes, storage, repeat):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, f'contacts.{storage}')
+            start = time.perf_counter()
+            book = build_book(size, file_name)
+            results.append({'size': size, 'operation': 'build and save',
+                            'seconds': time.perf_counter() - start, 'peak_bytes': None})
+            ph.contacts = book
+            for name, func in operations(book, file_name):
+                # Операции, которые строят индекс, выполняются только один раз
+                seconds = best_time(func, 1 if 'builds' in name else repeat)
+                peak = None if 'builds' in name else peak_memory(func)
+                results.append({'size': size, 'operation': name,
+                                'seconds': seconds, 'peak_bytes': peak})
+                print(f'{size:>9} {name:<24} {seconds * 1000:>12.2f} ms'
+                      f' {"" if peak is None else f"{peak / 1024:>12.0f} KiB"}')
+            if book.storage and hasattr(book.storage, 'connection'):
+                book.storage.connection.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--storage', choices=['bin', 'db'], default='bin',
+                        help='bin - pickle with journal, db - SQLite')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_contacts.json')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.storage, args.repeat)
+    with open(args.output, 'w') as fh:
+        json.dump({'benchmark': 'contacts', 'commit': git_commit(), 'storage': args.storage,
+                   'python': platform.python_version(), 'results': results}, fh, indent=2)
+    print(f'Results are saved in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Memory used by one contact of the loaded contacts book.
+
+   Compares the current Record with the layout it had before the compact
+   representation (a regular object with __dict__, phones as a list of
+   formatted strings and date of birth as a string). Both books are pickled
+   and loaded back the way load_from_file does it, and the memory allocated
+   by the load is divided by the number of contacts.
+
+   Run from the folder with setup.py:
+       python -m benchmarks.bench_memory --count 100000
+"""
+import argparse
+import gc
+import pickle
+import tracemalloc
+
+from personal_helper.personal_helper import Record
+
+from .synthetic import fake_states
+
+
+class LegacyRecord:
+
+    def __init__(self, state):
+        self.name = state['name']
+        self._address = state['address']
+        self._phones_list = list(state['phones'])
+        self._email = state['email']
+        self._birthday = state['birthday']
+
+
+def loaded_size(blob):
+    gc.collect()
+    tracemalloc.start()
+    book = pickle.loads(blob)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del book
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    states = list(fake_states(args.count))
+    legacy = pickle.dumps({state['name']: LegacyRecord(state) for state in states})
+    compact = pickle.dumps({state['name']: Record.from_state(state) for state in states})
+
+    before = loaded_size(legacy) / args.count
+    after = loaded_size(compact) / args.count
+    print(f'Contacts:                 {args.count}')
+    print(f'Bytes per contact before: {before:.0f}')
+    print(f'Bytes per contact after:  {after:.0f}')
+    print(f'Saved:                    {100 * (1 - after / before):.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Timings, peak memory and I/O of the notes commands.
+
+   For every size a synthetic note.txt is generated, then the notes
+   commands are timed (the best of --repeat runs): opening the store with
+   and without a saved index, keyword, date range, tag and full-text
+   searches and the operations on one note by its ID. Peak memory is
+   measured with tracemalloc in a separate run. Bytes read and written are
+   taken from /proc/self/io where it exists. Reads through the memory-mapped
+   notes file are not counted there, so the bytes of the lines the store
+   slices from the map are added to the bytes read. Results are printed as
+   a table and written as JSON together with the current git commit.
+
+   Run from the folder with setup.py:
+       python -m benchmarks.bench_notes --sizes 10000 100000 1000000
+       python -m benchmarks.bench_notes --sizes 10000000 --repeat 1
+"""
+import argparse
+import contextlib
+from datetime import timedelta
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+
+from personal_helper import notes
+from personal_helper import personal_helper as ph
+from personal_helper.notes import NoteStore, id_datetime, key_id
+
+from .bench_contacts import best_time, consume, git_commit, peak_memory
+from .synthetic import fake_notes
+
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+# Байты строк, прочитанных хранилищем из отображенного в память файла
+mapped_read = 0
+
+
+def count_mapped_reads():
+    """Wraps the functions that slice lines from the mapped notes file to count their bytes."""
+    iter_lines, line_at = notes.iter_lines, notes.line_at
+
+    def counted_iter_lines(mm):
+        global mapped_read
+        for offset, raw in iter_lines(mm):
+            mapped_read += len(raw)
+            yield offset, raw
+
+    def counted_line_at(mm, offset):
+        global mapped_read
+        raw = line_at(mm, offset)
+        mapped_read += len(raw)
+        return raw
+
+    notes.iter_lines, notes.line_at = counted_iter_lines, counted_line_at
+
+
+def io_counters():
+    """Returns (bytes read, bytes written) by the process or None.
+       Bytes read include the lines read from the mapped notes file.
+    """
+    try:
+        with open('/proc/self/io') as fh:
+            values = dict(line.split(': ') for line in fh.read().splitlines())
+    except OSError:
+        return None
+    return int(values['rchar']) + mapped_read, int(values['wchar'])
+
+
+def measured_io(func):
+    before = io_counters()
+    func()
+    after = io_counters()
+    if before is None or after is None:
+        return None, None
+    return after[0] - before[0], after[1] - before[1]
+
+
+def quiet(func):
+    # Команды заметок печатают предупреждения о датах, они не нужны в таблице
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return consume(func() or '')
+    return run
+
+
+def build_file(size, file_name):
+    with open(file_name, 'w', encoding='utf-8') as fh:
+        fh.writelines(fake_notes(size))
+
+
+def operations(file_name):
+    store = ph.notes
+    order = store.order
+    some_id = key_id(order[len(order) // 2])
+    first_day = id_datetime(some_id)
+    week_start = first_day.strftime('%d.%m.%Y')
+    week_end = (first_day + timedelta(days=6)).strftime('%d.%m.%Y')
+    some_id = some_id.split()
+    # Каждый запуск удаления удаляет следующую заметку
+    victims = iter(key_id(key).split() for key in order[:len(order) // 3])
+
+    def open_saved():
+        NoteStore(file_name).sync()
+
+    def open_rebuild():
+        store = NoteStore(file_name)
+        store.index_name += '.missing'
+        store.sync()
+
+    def save_index():
+        # Индекс записывается только после изменений, поэтому каждый запуск его помечает
+        store.changed = store.text_changed = True
+        store.save_index()
+
+    return [
+        ('open (saved index)', open_saved),
+        ('open (rebuild index)', open_rebuild),
+        ('find note keyword (cold)', quiet(lambda: ph.find_note(['deadline']))),
+        ('find note keyword', quiet(lambda: ph.find_note(['deadline']))),
+        ('find note week', quiet(lambda: ph.find_note(['', week_start, week_end]))),
+        ('find note #tag', quiet(lambda: ph.find_note(['#urgent']))),
+        ('find note --limit 10', quiet(lambda: ph.find_note(['bill', '--limit', '10']))),
+        ('find tag AND NOT', quiet(lambda: ph.find_tag(['work', 'urgent', 'NOT', 'done']))),
+        ('find text (builds index)', quiet(lambda: ph.find_text(['electricity', 'bill', '--limit', '10']))),
+        ('find text', quiet(lambda: ph.find_text(['"electricity bill"', 'rent', '--limit', '10']))),
+        ('add note', quiet(lambda: ph.add_note(['new', 'note', 'about', 'the', 'project']))),
+        ('change note', quiet(lambda: ph.change_note(some_id + ['changed', 'text', 'of', 'the', 'note']))),
+        ('tag note', quiet(lambda: ph.tag_note(some_id + ['bench']))),
+        ('delete note', quiet(lambda: ph.delete_note(next(victims)))),
+        ('save index', save_index),
+        ('compact notes', quiet(lambda: ph.compact_notes([]))),
+    ]
+
+
+def run(sizes, repeat):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'note.txt')
+            start = time.perf_counter()
+            build_file(size, file_name)
+            results.append({'size': size, 'operation': 'generate file', 'seconds': time.perf_counter() - start,
+                            'peak_bytes': None, 'read_bytes': None, 'written_bytes': os.path.getsize(file_name)})
+            ph.notes = NoteStore(file_name)
+            ph.notes.sync()
+            ph.notes.save_index()
+            for name, func in operations(file_name):
+                # Холодные запуски и построение индексов выполняются только один раз
+                if 'cold' in name or 'builds' in name:
+                    start = time.perf_counter()
+                    read, written = measured_io(func)
+                    seconds = time.perf_counter() - start
+                    peak = None
+                else:
+                    read, written = measured_io(func)
+                    seconds = best_time(func, repeat)
+                    peak = peak_memory(func)
+                results.append({'size': size, 'operation': name, 'seconds': seconds, 'peak_bytes': peak,
+                                'read_bytes': read, 'written_bytes': written})
+                print(f'{size:>9} {name:<26} {seconds * 1000:>12.2f} ms'
+                      f' {"" if peak is None else f"{peak / 1024:>10.0f} KiB"}'
+                      f' {"" if read is None else f"{read / 1024:>10.0f} KiB read {written / 1024:>8.0f} KiB written"}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_notes.json')
+    args = parser.parse_args()
+
+    count_mapped_reads()
+    results = run(args.sizes, args.repeat)
+    with open(args.output, 'w') as fh:
+        json.dump({'benchmark': 'notes', 'commit': git_commit(),
+                   'python': platform.python_version(), 'results': results}, fh, indent=2)
+    print(f'Results are saved in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+import random
+
+
+FIRST_NAMES = ['Oleksandr', 'Olena', 'Andrii', 'Iryna', 'Dmytro', 'Natalia', 'Serhii', 'Tetiana',
+               'Mykola', 'Yulia', 'Volodymyr', 'Oksana', 'Pavlo', 'Svitlana', 'Yurii', 'Kateryna']
+LAST_NAMES = ['Shevchenko', 'Bondarenko', 'Kovalenko', 'Tkachenko', 'Kravchenko', 'Oliinyk',
+              'Shevchuk', 'Polishchuk', 'Bondar', 'Tkachuk', 'Marchenko', 'Lysenko', 'Rudenko']
+CITIES = ['Kyiv', 'Lviv', 'Kharkiv', 'Odesa', 'Dnipro', 'Zaporizhzhia', 'Vinnytsia', 'Poltava']
+STREETS = ['Shevchenka', 'Franka', 'Khreshchatyk', 'Nauki', 'Sadova', 'Hrushevskoho', 'Lesi Ukrainky']
+OPERATORS = ['050', '063', '066', '067', '068', '073', '093', '095', '096', '097', '098', '099']
+DOMAINS = ['example.com', 'i.ua', 'ukr.net', 'gmail.com', 'meta.ua']
+
+
+def fake_states(count, seed=0):
+    """Yields reproducible contacts in the Record.to_state() format.
+
+       Most contacts have one or two phones, an email, an address and a date
+       of birth, some fields are left empty as they are in real books.
+    """
+    rnd = random.Random(seed)
+    first_birthday = date(1950, 1, 1)
+    for i in range(count):
+        first = rnd.choice(FIRST_NAMES)
+        last = rnd.choice(LAST_NAMES)
+        phones = [f'({rnd.choice(OPERATORS)}){rnd.randrange(1000):03d}-{rnd.randrange(100):02d}-{rnd.randrange(100):02d}'
+                  for _ in range(rnd.choice((0, 1, 1, 1, 2, 2, 3)))]
+        email = f'{first.lower()}.{last.lower()}{i}@{rnd.choice(DOMAINS)}' if rnd.random() < 0.8 else None
+        address = (f'{rnd.choice(CITIES)}, {rnd.choice(STREETS)}, {rnd.randrange(1, 200)}'
+                   if rnd.random() < 0.6 else None)
+        birthday = ((first_birthday + timedelta(days=rnd.randrange(365 * 55))).strftime('%d.%m.%Y')
+                    if rnd.random() < 0.7 else None)
+        yield {'name': f'{first} {last} {i}', 'address': address, 'phones': phones,
+               'email': email, 'birthday': birthday}
+
+
+WORDS = ['meeting', 'call', 'bill', 'electricity', 'water', 'rent', 'buy', 'milk', 'bread', 'project',
+         'report', 'deadline', 'doctor', 'birthday', 'gift', 'car', 'service', 'train', 'ticket', 'Kyiv',
+         'Lviv', 'book', 'read', 'idea', 'plan', 'budget', 'review', 'code', 'release', 'holiday']
+TAGS = ['work', 'home', 'family', 'urgent', 'finance', 'health', 'travel', 'shopping', 'ideas', 'done']
+
+
+def fake_notes(count, years=5, seed=0):
+    """Yields reproducible lines of note.txt sorted by date.
+
+       Notes are spread over the given number of years ending today with a
+       random gap between them, have from 3 to 20 words and most of them
+       have no tags, some have one or a few.
+    """
+    rnd = random.Random(seed)
+    step = years * 365 * 24 * 3600 / count
+    moment = datetime.now() - timedelta(days=years * 365)
+    for _ in range(count):
+        moment += timedelta(seconds=max(1, int(rnd.expovariate(1 / step))))
+        text = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 20)))
+        tags = rnd.sample(TAGS, rnd.choice((0, 0, 0, 1, 1, 2, 3)))
+        yield moment.strftime('%d.%m.%Y - %H:%M:%S') + ' :: ' + text + ''.join(f'  #{tag}' for tag in tags) + '\n'
@@ -0,0 +1,81 @@
+"""Archive of old notes in compressed per-month segments.
+
+   Every segment keeps the notes of one month in the note.txt line format,
+   sorted by ID and compressed with lzma, e.g. note.txt.archive/202201.txt.xz.
+   The manifest.json file in the same folder records the keys of the first
+   and the last note and the number of notes of every segment, so searches
+   skip the segments outside the requested dates without opening them.
+   Segments are decompressed while they are read, line by line.
+"""
+import json
+import os
+
+
+SEGMENT_SUFFIX = '.txt.xz'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+class NoteArchive:
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_name = os.path.join(folder, MANIFEST_NAME)
+        # Манифест читается при первом обращении к архиву
+        self.segments = None
+
+    def load(self):
+        if self.segments is None:
+            try:
+                with open(self.manifest_name, 'r', encoding='utf-8') as fh:
+                    self.segments = json.load(fh)['segments']
+            except FileNotFoundError:
+                self.segments = {}
+        return self.segments
+
+    def save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_name = f'{self.manifest_name}.tmp'
+        with open(tmp_name, 'w', encoding='utf-8') as fh:
+            json.dump({'version': MANIFEST_VERSION, 'segments': self.segments}, fh, indent=2, sort_keys=True)
+        os.replace(tmp_name, self.manifest_name)
+
+    def __contains__(self, month):
+        return month in self.load()
+
+    def __len__(self):
+        return sum(segment['count'] for segment in self.load().values())
+
+    def path(self, month):
+        return os.path.join(self.folder, self.load()[month]['file'])
+
+    def months_between(self, first, last):
+        """Returns the sorted months whose notes may have keys from first to last."""
+        return sorted(month for month, segment in self.load().items()
+                      if segment['first'] <= last and segment['last'] >= first)
+
+    def read(self, month):
+        """Yields the raw lines of the segment."""
+        import lzma
+
+        with lzma.open(self.path(month), 'rb') as fh:
+            yield from fh
+
+    def write(self, month, lines, first, last):
+        """Replaces the segment of the month with the sorted raw lines."""
+        import lzma
+
+        os.makedirs(self.folder, exist_ok=True)
+        file_name = f'{month}{SEGMENT_SUFFIX}'
+        tmp_name = os.path.join(self.folder, f'{file_name}.tmp')
+        with lzma.open(tmp_name, 'wb') as fh:
+            fh.writelines(lines)
+        os.replace(tmp_name, os.path.join(self.folder, file_name))
+        self.load()[month] = {'file': file_name, 'first': first, 'last': last, 'count': len(lines)}
+        self.save()
+
+    def remove(self, month):
+        file_name = self.path(month)
+        del self.segments[month]
+        self.save()
+        os.remove(file_name)
@@ -1,6 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import json
 import os
 import re
 import shutil
+import unicodedata
 
 
 STANDARD_FOLDERS = ['archives', 'audio', 'documents', 'images', 'video']
@@ -12,131 +16,399 @@ FILE_TYPES = {'images': ('JPEG', 'PNG', 'JPG', 'SVG', 'BMP', 'TIF', 'TIFF', 'GIF
               'video':  ('AVI', 'MP4', 'MOV', 'MKV', 'MPG')
               }
 
-files_info = {'images': [], 'archives': [], 'documents': [],
-              'audio': [], 'video': [], 'unknown': [], 'known': []}
+# Файл JSON со своими категориями вместо FILE_TYPES, например {"images": ["JPG", "PNG"], "books": ["EPUB"]}
+FILE_TYPES_VARIABLE = 'PERSONAL_HELPER_CLEAN_TYPES'
+
+# Сигнатуры в начале файла: (смещение, байты, расширение)
+SIGNATURES = [(0, b'\xff\xd8\xff', 'JPG'),
+              (0, b'\x89PNG\r\n\x1a\n', 'PNG'),
+              (0, b'GIF8', 'GIF'),
+              (0, b'%PDF', 'PDF'),
+              (0, b'PK\x03\x04', 'ZIP'),
+              (257, b'ustar', 'TAR'),
+              (0, b'ID3', 'MP3'),
+              (0, b'OggS', 'OGG'),
+              (8, b'WAVE', 'WAV'),
+              (8, b'AVI ', 'AVI'),
+              (0, b'\x1a\x45\xdf\xa3', 'MKV'),
+              (4, b'ftyp', 'MP4')]
+SIGNATURE_SIZE = max(offset + len(magic) for offset, magic, ext in SIGNATURES)
+# Формат для shutil.unpack_archive, если у архива нет известного расширения
+ARCHIVE_FORMATS = {'ZIP': 'zip', 'TAR': 'tar'}
+
+# По умолчанию файлы перемещаются по одному, как и раньше
+DEFAULT_WORKERS = 1
+
+# Строчные буквы алфавитов и их латинская запись, заглавные буквы добавляются автоматически
+ALPHABETS = [
+    # Русский и украинский
+    {'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'ґ': 'g', 'д': 'd', 'е': 'e', 'ё': 'io', 'є': 'ye',
+     'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'і': 'i', 'ї': 'yi', 'к': 'k', 'л': 'l', 'м': 'm',
+     'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h',
+     'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'iu',
+     'я': 'ia'},
+    # Белорусский, сербский, македонский
+    {'ў': 'u', 'ђ': 'dj', 'ј': 'j', 'љ': 'lj', 'њ': 'nj', 'ћ': 'c', 'џ': 'dz', 'ѓ': 'gj', 'ќ': 'kj',
+     'ѕ': 'dz'},
+    # Греческий, буквы с ударением приводятся к ним через unicodedata
+    {'α': 'a', 'β': 'v', 'γ': 'g', 'δ': 'd', 'ε': 'e', 'ζ': 'z', 'η': 'i', 'θ': 'th', 'ι': 'i',
+     'κ': 'k', 'λ': 'l', 'μ': 'm', 'ν': 'n', 'ξ': 'x', 'ο': 'o', 'π': 'p', 'ρ': 'r', 'σ': 's',
+     'ς': 's', 'τ': 't', 'υ': 'y', 'φ': 'f', 'χ': 'ch', 'ψ': 'ps', 'ω': 'o'},
+    # Латинские буквы, которые не раскладываются на букву и диакритический знак
+    {'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'ı': 'i'}]
+
+NOT_ALLOWED = re.compile(r'[^A-Za-z0-9_\./:]')
+FOLDER_CACHE_SIZE = 4096
+
+
+def new_files_info(file_types):
+
+    info = {file_type: [] for file_type in file_types}
+    info.update({'unknown': [], 'known': []})
+    return info
+
+
+files_info = new_files_info(FILE_TYPES)
+
+
+def load_file_types(file_name=None):
+    """Returns the file categories from the JSON file or FILE_TYPES.
+
+       Without file_name, the file named in PERSONAL_HELPER_CLEAN_TYPES is used.
+       The file maps folder names to lists of extensions.
+    """
+    file_name = file_name or os.environ.get(FILE_TYPES_VARIABLE)
+    if not file_name:
+        return FILE_TYPES
+    try:
+        with open(file_name, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError) as error:
+        raise ValueError(f'File types can not be read from {file_name}: {error}')
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f'File types in {file_name} must be an object of folder names and extension lists.')
+    file_types = {}
+    for file_type, extensions in data.items():
+        if (not file_type or file_type in ('unknown', 'known') or set(file_type) & set('/\\.')
+                or not isinstance(extensions, list) or not all(isinstance(ext, str) for ext in extensions)):
+            raise ValueError(f'Wrong file type {file_type!r} in {file_name}.')
+        file_types[file_type] = tuple(ext.lstrip('.').upper() for ext in extensions)
+    return file_types
+
+
+def extension_table(file_types):
+    """Maps every upper case extension to its category, the first category wins."""
+    table = {}
+    for file_type, extensions in file_types.items():
+        for ext in extensions:
+            table.setdefault(ext, file_type)
+    return table
+
+
+def sniff(path):
+    """Returns the extension matching the first bytes of the file or None."""
+    try:
+        with open(path, 'rb') as fh:
+            head = fh.read(SIGNATURE_SIZE)
+    except OSError:
+        return None
+    for offset, magic, ext in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return ext
+    return None
 
 
 def create_folder(name):
 
-    if not os.path.exists(name):
-        os.mkdir(name)
+    # Папку могут одновременно создавать несколько потоков
+    os.makedirs(name, exist_ok=True)
 
 
 def create_folders_chain(chain, root, file_type):
 
-    next_folder = ''
-    # Просмотр элементов пути для папки назначения
+    next_folder = fr'{root}/{file_type}'
+    # Папки создаются по одной от корня, чтобы глубокая цепочка не упиралась в предел рекурсии makedirs
     for folder_part in chain.split('/'):
         if folder_part:
             next_folder += f'/{folder_part}'
-            # Создаем вложенную папку по цепочке
-            create_folder(fr'{root}/{file_type}{next_folder}')
+            create_folder(next_folder)
+
+
+def translit_table():
+    """Builds the str.translate table from the lower case letters of all the alphabets."""
+    table = {}
+    for alphabet in ALPHABETS:
+        for letter, latin in alphabet.items():
+            table[letter] = latin
+            upper = letter.upper()
+            # У некоторых букв нет одной заглавной буквы, например у ß
+            if len(upper) == 1 and upper != letter:
+                table[upper] = latin.capitalize()
+    return str.maketrans(table)
+
+
+TRANSLIT_TABLE = translit_table()
 
 
 def normalize(string):
 
-    translit_table = {'а': 'a', 'А': 'A',
-                      'б': 'b', 'Б': 'B',
-                      'в': 'v', 'В': 'V',
-                      'г': 'g', 'Г': 'G',
-                      'ґ': 'g', 'Ґ': 'G',
-                      'д': 'd', 'Д': 'D',
-                      'е': 'e', 'Е': 'E',
-                      'ё': 'io', 'Ё': 'Io',
-                      'є': 'ye', 'Є': 'Ye',
-                      'ж': 'zh', 'Ж': 'Zh',
-                      'з': 'z', 'З': 'Z',
-                      'и': 'i', 'И': 'I',
-                      'й': 'y', 'Й': 'Y',
-                      'і': 'i', 'І': 'I',
-                      'ї': 'yi', 'Ї': 'Yi',
-                      'к': 'k', 'К': 'K',
-                      'л': 'l', 'Л': 'L',
-                      'м': 'm', 'М': 'M',
-                      'н': 'n', 'Н': 'N',
-                      'о': 'o', 'О': 'O',
-                      'п': 'p', 'П': 'P',
-                      'р': 'r', 'Р': 'R',
-                      'с': 's', 'С': 'S',
-                      'т': 't', 'Т': 'T',
-                      'у': 'u', 'У': 'U',
-                      'ф': 'f', 'Ф': 'F',
-                      'х': 'h', 'Х': 'H',
-                      'ц': 'ts', 'Ц': 'Ts',
-                      'ч': 'ch', 'Ч': 'Ch',
-                      'ш': 'sh', 'Ш': 'Sh',
-                      'щ': 'sch', 'Щ': 'Sch',
-                      'ъ': '', 'Ъ': '',
-                      'ы': 'y', 'Ы': 'Y',
-                      'ь': '', 'Ь': '',
-                      'э': 'e', 'Э': 'E',
-                      'ю': 'iu', 'Ю': 'Iu',
-                      'я': 'ia', 'Я': 'Ia'}
-
-    for key in translit_table:
-        string = string.replace(key, translit_table[key])
-
-    return re.sub('[^A-Za-z0-9_\./:]', '_', string)
-
-
-def order_by_ext(file_type, extensions, item, folder, root):
-
-    # Расширение файла
-    ext = item[item.rfind(".") + 1:]
+    string = string.translate(TRANSLIT_TABLE)
+    if not string.isascii():
+        # Буквы с диакритикой (é, ą, ά) заменяются буквой без знаков
+        string = ''.join(char for char in unicodedata.normalize('NFKD', string)
+                         if not unicodedata.combining(char)).translate(TRANSLIT_TABLE)
+    return NOT_ALLOWED.sub('_', string)
+
+
+@lru_cache(maxsize=FOLDER_CACHE_SIZE)
+def normalize_folder(folder):
+
+    # Файлы одной папки идут подряд, поэтому путь папки нормализуется один раз
+    return normalize(folder)
+
+
+def move_file(source, chain, root, file_type, item):
+
+    create_folders_chain(chain, root, file_type)
+    shutil.move(source, fr'{root}/{file_type}{chain}/{item}')
+
+
+def extract_archive(archive, chain, root, archive_folder, archive_format=None):
+
+    create_folders_chain(f'{chain}/{archive_folder}', root, 'archives')
+    shutil.unpack_archive(archive, fr'{root}/archives{chain}/{archive_folder}', archive_format)
+    shutil.move(archive, fr'{root}/archives{chain}/{archive_folder}')
+
+
+def move_key(source, chain, root, file_type, item):
+
+    return file_type, chain, item
+
+
+def extraction_key(archive, chain, root, archive_folder, archive_format=None):
+
+    return chain, archive_folder
+
+
+def run_after(previous, func, *task):
+
+    # Задача с тем же местом назначения, что и предыдущая, ждет ее окончания
+    if previous is not None:
+        previous.result()
+    func(*task)
+
+
+def run_group(func, tasks):
+
+    for task in tasks:
+        func(*task)
+
+
+def run_tasks(func, tasks, executor, key):
+    """Runs func for every task tuple in the executor or, without it, one by one.
+
+       Tasks with the same key(*task) write to the same place, so they run one
+       after another in the order of the plan, as without the executor.
+    """
+    if executor is None:
+        for task in tasks:
+            func(*task)
+        return
+    futures = []
+    last = {}
+    for task in tasks:
+        task_key = key(*task)
+        # Предыдущая задача отправлена в пул раньше, поэтому ожидание не блокирует пул навсегда
+        future = executor.submit(run_after, last.get(task_key), func, *task)
+        last[task_key] = future
+        futures.append(future)
+    # Ошибка любой задачи передается дальше, как и при последовательной работе
+    for future in futures:
+        future.result()
+
+
+def run_groups(func, tasks, executor, key):
+    """Runs the tasks grouped by key(*task), every group one by one in a single job.
+       Unlike run_tasks, works with a process pool.
+    """
+    groups = {}
+    for task in tasks:
+        groups.setdefault(key(*task), []).append(task)
+    futures = [executor.submit(run_group, func, group) for group in groups.values()]
+    for future in futures:
+        future.result()
+
+
+def order_by_ext(item, folder, root, extension_types, sniffing, extractions):
+    """Classifies the file once and returns its planned move or None for an unknown type."""
+    # Расширение файла, у файла без точки в имени его нет
+    ext = item[item.rfind(".") + 1:] if '.' in item else ''
     ext_upper = ext.upper()
+    file_type = extension_types.get(ext_upper)
+    archive_format = None
+    # Известное расширение важнее содержимого: EPUB, DOCX, JAR - это тоже ZIP, а M4A - тоже ftyp
+    if sniffing and file_type is None:
+        content_ext = sniff(f'{folder}/{item}')
+        if content_ext in extension_types:
+            file_type = extension_types[content_ext]
+            archive_format = ARCHIVE_FORMATS.get(content_ext)
+            ext_upper = content_ext
+    if file_type is None:
+        if ext_upper:
+            files_info['unknown'].append(ext_upper)
+        return None
+
     normalized_item = normalize(item)
     # Определяем нормализованное имя папки назначения без учета корневой папки
-    destination_folder = normalize(folder.replace(root, ''))
+    destination_folder = normalize_folder(folder.replace(root, ''))
     destination_file_path = fr'{root}/{file_type}{destination_folder}/{normalized_item}'
-    if ext_upper in extensions:
-        files_info[file_type].append(destination_file_path)
-        if ext_upper not in files_info['known']:
-            files_info['known'].append(ext_upper)
-        create_folders_chain(destination_folder, root, file_type)
-        shutil.move(fr'{folder}/{item}', destination_file_path)
-
-        if file_type == 'archives':
-            archive_folder = normalized_item.removesuffix(f'.{ext}')
-            create_folders_chain(
-                f'{destination_folder}/{archive_folder}', root, 'archives')
-            shutil.unpack_archive(
-                destination_file_path, fr'{root}/archives{destination_folder}/{archive_folder}')
-            shutil.move(destination_file_path,
-                        fr'{root}/archives{destination_folder}/{archive_folder}')
-    else:
-        files_info['unknown'].append(ext_upper)
+    files_info[file_type].append(destination_file_path)
+    if ext_upper not in files_info['known']:
+        files_info['known'].append(ext_upper)
+    if file_type == 'archives':
+        archive_folder = normalized_item.removesuffix(f'.{ext}') if ext else normalized_item
+        # Папка распаковки не может называться так же, как сам архив
+        if archive_folder == normalized_item:
+            archive_folder += '_files'
+        extractions.append((destination_file_path, destination_folder, root, archive_folder, archive_format))
+    # Файл только планируется к перемещению, само перемещение выполняется позже
+    return fr'{folder}/{item}', destination_folder, root, file_type, normalized_item
 
 
-def order_files(folder, root):
+def sorted_entries(folder):
+
+    with os.scandir(folder) as entries:
+        return iter(sorted(entries, key=lambda entry: entry.name))
+
+
+def walk_files(folder, skipped=STANDARD_FOLDERS):
+    """Yields (folder, file name) for the files in the folder and its subfolders.
+
+       The tree is walked depth-first without recursion, the entries of every
+       folder in sorted order. Standard folders and links to folders are skipped,
+       so a link can not make a loop.
+    """
+    # Стек итераторов по содержимому открытых папок, от корня до текущей
+    stack = [(folder, sorted_entries(folder))]
+    while stack:
+        current, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+        # Тип элемента берется из DirEntry без отдельного stat для каждого файла
+        elif entry.is_dir(follow_symlinks=False):
+            if entry.name not in skipped:                                   # Если папка не относится к стандартным
+                subfolder = f'{current}/{entry.name}'
+                stack.append((subfolder, sorted_entries(subfolder)))
+        elif not (entry.is_symlink() and entry.is_dir()):
+            yield current, entry.name
+
+
+def order_files(folder, root, extractions, file_types=FILE_TYPES, sniffing=False):
+    """Yields the planned moves of the files in the folder and its subfolders.
+
+       The moves are yielded while the tree is being walked, in the same order
+       every time; the planned extractions are appended to extractions.
+    """
+    extension_types = extension_table(file_types)
+    for file_folder, item in walk_files(folder, tuple(file_types)):
+        # Категория определяется одним поиском в таблице расширений
+        move = order_by_ext(item, file_folder, root, extension_types, sniffing, extractions)
+        if move is not None:
+            yield move
+
+
+def execute_plan(moves, extractions, workers, processes):
+    """Moves the files, then extracts the archives.
+
+       The moves may be an iterator, they start before it is exhausted. With more
+       than one worker, the moves and the extractions run on a thread pool; with
+       processes the extractions run on a process pool instead. Files moved to
+       the same name and archives extracted to the same folder are handled one
+       after another in the order of the plan, so the result is the same as
+       without the pools.
+    """
+    if workers <= 1 and not processes:
+        run_tasks(move_file, moves, None, move_key)
+        run_tasks(extract_archive, extractions, None, extraction_key)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        run_tasks(move_file, moves, executor, move_key)
+        # Архивы распаковываются после того, как перемещены все файлы
+        if not processes:
+            run_groups(extract_archive, extractions, executor, extraction_key)
+    if processes and extractions:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            run_groups(extract_archive, extractions, executor, extraction_key)
+
+
+def pop_options(command_line):
+    """Removes --workers N, --processes and --sniff from the command line.
+
+       Returns (workers, processes, sniffing).
+    """
+    workers = DEFAULT_WORKERS
+    processes = '--processes' in command_line
+    if processes:
+        command_line.remove('--processes')
+    sniffing = '--sniff' in command_line
+    if sniffing:
+        command_line.remove('--sniff')
+    if '--workers' in command_line:
+        position = command_line.index('--workers')
+        value = command_line[position + 1] if position + 1 < len(command_line) else ''
+        if not value.isdigit() or int(value) < 1:
+            raise ValueError('Number of workers must be a positive integer.')
+        workers = int(value)
+        del command_line[position:position + 2]
+    elif processes:
+        # --processes без --workers распаковывает архивы во всех ядрах процессора
+        workers = os.cpu_count() or 1
+    return workers, processes, sniffing
 
-    # Перебираем элементы в текущей папке
-    for item in os.listdir(folder):
-        if os.path.isdir(f'{folder}/{item}'):
-            if item not in STANDARD_FOLDERS:                                # Если папка не относится к стандартным
-                # Рекурсивный просмотр папки
-                order_files(f'{folder}/{item}', root)
-        else:
-            for file_type, extensions in FILE_TYPES.items():
-                # Перебираем категории файлов и рассортировываем по стандартным папкам
-                order_by_ext(file_type, extensions, item, folder, root)
 
+def remove_empty(folder, standard_folders=STANDARD_FOLDERS):
+    """Removes the empty folders in one bottom-up pass and returns their number.
 
-def remove_empty(folder):
+       A folder whose name is one of standard_folders is kept even if it is empty,
+       a folder left empty after its subfolders are removed is removed too.
+    """
+    protected = set(standard_folders)
+    # Папки в порядке обхода сверху вниз и число элементов в каждой из них
+    folders = []
+    entries_count = {}
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        folders.append(current)
+        count = 0
+        with os.scandir(current) as entries:
+            for entry in entries:
+                count += 1
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(f'{current}/{entry.name}')
+        entries_count[current] = count
 
-    while True:
-        empty_nonstd_folders_count = 0
-        tree = os.walk(folder)
-        for item in tree:
-            if item[1] == [] and item[2] == [] and not item[0].endswith(tuple(STANDARD_FOLDERS)):
-                empty_nonstd_folders_count += 1
-                os.rmdir(item[0])
-        if empty_nonstd_folders_count == 0:
-            break
+    removed = 0
+    # Вложенные папки обрабатываются раньше родительской, поэтому одного прохода достаточно
+    for current in reversed(folders[1:]):
+        parent, name = current.rsplit('/', 1)
+        if entries_count[current] == 0 and name not in protected:
+            os.rmdir(current)
+            entries_count[parent] -= 1
+            removed += 1
+    return removed
 
 
 def start_cleaning(command_line):
 
     global files_info
+    command_line = list(command_line)
+    try:
+        workers, processes, sniffing = pop_options(command_line)
+        file_types = load_file_types()
+    except ValueError as error:
+        return str(error)
     if len(command_line) == 0:
         folder_name = ''
     elif os.path.exists(command_line[0]):
@@ -145,15 +417,17 @@ def start_cleaning(command_line):
         folder_name = ''
     print(folder_name)
     if folder_name:
-        create_folder(fr'{folder_name}/archives')
-        create_folder(fr'{folder_name}/audio')
-        create_folder(fr'{folder_name}/documents')
-        create_folder(fr'{folder_name}/images')
-        create_folder(fr'{folder_name}/video')
+        files_info = new_files_info(file_types)
+        for file_type in file_types:
+            create_folder(fr'{folder_name}/{file_type}')
         print('Start cleaning...')
-        order_files(folder_name, folder_name)
+        extractions = []
+        # Список файлов и расширений собирается в основном потоке, файлы перемещаются по ходу обхода
+        moves = order_files(folder_name, folder_name, extractions, file_types, sniffing)
+        execute_plan(moves, extractions, workers, processes)
         print('Removing empty folders...')
-        remove_empty(folder_name)
+        removed = remove_empty(folder_name, tuple(file_types))
+        print(f'Empty folders removed: {removed}')
         for key, value in files_info.items():
             if key == 'unknown':
                 pass
@@ -174,8 +448,7 @@ def start_cleaning(command_line):
         else:
             return_str = f'Unknown extensions: {set(files_info["unknown"]) - set(files_info["known"])}'
 
-        files_info = {'images': [], 'archives': [], 'documents': [],
-                      'audio': [], 'video': [], 'unknown': [], 'known': []}
+        files_info = new_files_info(FILE_TYPES)
     elif len(command_line) > 0:
         return_str = f'There is no folder {command_line[0]}.'
     else:
@@ -0,0 +1,137 @@
+"""Reading and writing contacts in CSV and vCard files.
+
+   Both directions work with plain dicts in the Record.to_state() format
+   ({'name', 'address', 'phones', 'email', 'birthday'}) and stream the file,
+   so the size of the file does not matter. Validation of the values is
+   left to the caller.
+"""
+import csv
+import re
+
+
+CSV_FIELDS = ['name', 'phones', 'email', 'address', 'birthday']
+VCARD_EXTENSIONS = ('.vcf', '.vcard')
+# Части ADR разделяются ';', перед которой нет обратной косой черты
+ADR_SEPARATOR = re.compile(r'(?<!\\);')
+
+
+def is_vcard(file_name):
+    return file_name.lower().endswith(VCARD_EXTENSIONS)
+
+
+def read_contacts(file_name):
+    """Yields (line number, state) pairs for every contact in the file."""
+    if is_vcard(file_name):
+        return read_vcard(file_name)
+    return read_csv(file_name)
+
+
+def write_contacts(file_name, states):
+    if is_vcard(file_name):
+        return write_vcard(file_name, states)
+    return write_csv(file_name, states)
+
+
+def read_csv(file_name):
+    # utf-8-sig понимает файлы, сохраненные из Excel с BOM
+    with open(file_name, 'r', encoding='utf-8-sig', newline='') as fh:
+        reader = csv.DictReader(fh)
+        reader.fieldnames = [field.strip().lower() for field in reader.fieldnames or []]
+        for row in reader:
+            phones = row.get('phones') or row.get('phone') or ''
+            yield reader.line_num, {'name': (row.get('name') or '').strip(),
+                                    'address': (row.get('address') or '').strip() or None,
+                                    'phones': [phone.strip() for phone in phones.split(',') if phone.strip()],
+                                    'email': (row.get('email') or '').strip() or None,
+                                    'birthday': (row.get('birthday') or '').strip() or None}
+
+
+def write_csv(file_name, states):
+    count = 0
+    with open(file_name, 'w', encoding='utf-8', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(CSV_FIELDS)
+        for state in states:
+            writer.writerow([state['name'], ', '.join(state['phones']), state['email'] or '',
+                             state['address'] or '', state['birthday'] or ''])
+            count += 1
+    return count
+
+
+def vcard_unescape(value):
+    return (value.replace('\\n', '\n').replace('\\N', '\n').replace('\\,', ',')
+            .replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def vcard_escape(value):
+    return (value.replace('\\', '\\\\').replace(',', '\\,').replace(';', '\\;')
+            .replace('\n', '\\n'))
+
+
+def unfold(fh):
+    # Длинные строки vCard переносятся, продолжение начинается с пробела или табуляции
+    line_number, current, start = 0, None, 0
+    for line_number, line in enumerate(fh, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, line_number
+    if current is not None:
+        yield start, current
+
+
+def read_vcard(file_name):
+    with open(file_name, 'r', encoding='utf-8-sig') as fh:
+        state, start = None, 0
+        for line_number, line in unfold(fh):
+            name, _, value = line.partition(':')
+            prop = name.split(';')[0].upper()
+            if prop == 'BEGIN':
+                state = {'name': '', 'address': None, 'phones': [], 'email': None, 'birthday': None}
+                start = line_number
+            elif state is None:
+                continue
+            elif prop == 'END':
+                yield start, state
+                state = None
+            elif prop == 'FN':
+                state['name'] = vcard_unescape(value).strip()
+            elif prop == 'TEL':
+                state['phones'].append(value.strip())
+            elif prop == 'EMAIL' and not state['email']:
+                state['email'] = value.strip()
+            elif prop == 'ADR' and not state['address']:
+                # ADR состоит из семи частей через ';', пустые части пропускаются
+                parts = [vcard_unescape(part).strip() for part in ADR_SEPARATOR.split(value)]
+                state['address'] = ', '.join(part for part in parts if part) or None
+            elif prop == 'BDAY':
+                state['birthday'] = vcard_date(value.strip())
+
+
+def vcard_date(value):
+    digits = value.replace('-', '')
+    if len(digits) == 8 and digits.isdigit():
+        return f'{digits[6:8]}.{digits[4:6]}.{digits[:4]}'
+    return value
+
+
+def write_vcard(file_name, states):
+    count = 0
+    with open(file_name, 'w', encoding='utf-8', newline='\r\n') as fh:
+        for state in states:
+            lines = ['BEGIN:VCARD', 'VERSION:3.0', f'FN:{vcard_escape(state["name"])}']
+            lines.extend(f'TEL:{phone}' for phone in state['phones'])
+            if state['email']:
+                lines.append(f'EMAIL:{state["email"]}')
+            if state['address']:
+                lines.append(f'ADR:;;{vcard_escape(state["address"])};;;;')
+            if state['birthday']:
+                day, month, year = state['birthday'].split('.')
+                lines.append(f'BDAY:{year}-{month}-{day}')
+            lines.append('END:VCARD')
+            fh.write('\n'.join(lines) + '\n')
+            count += 1
+    return count
@@ -0,0 +1,348 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import date
+import calendar
+import heapq
+import math
+import re
+
+
+NON_DIGITS = re.compile(r'\D')
+WORD = re.compile(r'\w+')
+
+
+def searchable_text(state):
+    # Поля разделяются переводом строки, чтобы запрос не совпадал на стыке двух полей
+    fields = [state['name'], *state['phones'], state['email'],
+              state['address'], state['birthday']]
+    return '\n'.join(field for field in fields if field).lower()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted trigram index over the searchable fields of the contacts.
+
+       Every contact is indexed by the trigrams of its name, phones, email,
+       address and date of birth. A query is answered by intersecting the
+       posting sets of its trigrams and checking the substring only for the
+       few remaining candidates, records themselves are never rendered.
+    """
+
+    def __init__(self):
+        self.texts = {}
+        self.postings = defaultdict(set)
+
+    def update(self, name, state):
+        old_text = self.texts.pop(name, None)
+        new_text = searchable_text(state) if state else None
+        old_grams = trigrams(old_text) if old_text else set()
+        new_grams = trigrams(new_text) if new_text else set()
+        for gram in old_grams - new_grams:
+            names = self.postings[gram]
+            names.discard(name)
+            if not names:
+                del self.postings[gram]
+        for gram in new_grams - old_grams:
+            self.postings[gram].add(name)
+        if new_text is not None:
+            self.texts[name] = new_text
+
+    def search(self, query):
+        query = query.lower()
+        grams = trigrams(query)
+        if grams:
+            # Пересечение начинается с самого короткого списка кандидатов
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        else:
+            # Для запросов короче трех символов индекс не помогает
+            candidates = self.texts.keys()
+        return sorted(name for name in candidates if query in self.texts[name])
+
+
+def normalize_phone(phone):
+    return NON_DIGITS.sub('', phone)
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+class LookupIndex:
+    """Hash index from a normalized field value to the names of its owners.
+
+       Subclasses define keys_of() that extracts the indexed values from
+       the record state and normalize() that is applied to queries.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.owners = defaultdict(set)
+
+    def update(self, name, state):
+        for key in self.keys.pop(name, ()):
+            names = self.owners[key]
+            names.discard(name)
+            if not names:
+                del self.owners[key]
+        if state:
+            keys = self.keys_of(state)
+            for key in keys:
+                self.owners[key].add(name)
+            if keys:
+                self.keys[name] = keys
+
+    def lookup(self, value):
+        return sorted(self.owners.get(self.normalize(value), ()))
+
+
+class PhoneIndex(LookupIndex):
+
+    normalize = staticmethod(normalize_phone)
+
+    @staticmethod
+    def keys_of(state):
+        return tuple(normalize_phone(phone) for phone in state['phones'])
+
+
+class EmailIndex(LookupIndex):
+
+    normalize = staticmethod(normalize_email)
+
+    @staticmethod
+    def keys_of(state):
+        return (normalize_email(state['email']),) if state['email'] else ()
+
+
+class BirthdayIndex:
+    """Contacts sorted by the day of the year of their birthday.
+
+       Entries are (MMDD, name) pairs, so any period of dates is found with
+       two bisects per calendar year it touches. Birthdays on 29 February
+       are celebrated on 28 February in non-leap years.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.entries = []
+
+    def update(self, name, state):
+        key = self.keys.pop(name, None)
+        if key is not None:
+            del self.entries[bisect_left(self.entries, (key, name))]
+        if state and state['birthday']:
+            # Строка DD.MM.YYYY превращается в число MMDD без разбора даты целиком
+            birthday = state['birthday']
+            key = int(birthday[3:5]) * 100 + int(birthday[:2])
+            insort(self.entries, (key, name))
+            self.keys[name] = key
+
+    def between(self, first, last):
+        for year in range(first.year, last.year + 1):
+            start = first if year == first.year else date(year, 1, 1)
+            end = last if year == last.year else date(year, 12, 31)
+            start_key = start.month * 100 + start.day
+            end_key = end.month * 100 + end.day
+            leap = calendar.isleap(year)
+            if end_key == 228 and not leap:
+                end_key = 229
+            lo = bisect_left(self.entries, (start_key,))
+            hi = bisect_left(self.entries, (end_key + 1,))
+            for key, name in self.entries[lo:hi]:
+                month, day = divmod(key, 100)
+                if key == 229 and not leap:
+                    day = 28
+                yield date(year, month, day), name
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+class TextIndex:
+    """Inverted word index over the notes with BM25 ranking.
+
+       Every version of a note gets a document number. The posting list of
+       a word keeps the numbers of the documents with the word and how many
+       times it occurs there in two arrays, so hundreds of thousands of notes
+       take little memory. A changed or deleted note only marks its old
+       document as dead; dead documents are dropped by pack().
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.docs = []
+        self.numbers = {}
+        self.lengths = array('I')
+        self.postings = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def update(self, note_id, words):
+        number = self.numbers.pop(note_id, None)
+        if number is not None:
+            self.docs[number] = None
+            self.total_length -= self.lengths[number]
+        if words is None:
+            return
+        number = len(self.docs)
+        self.docs.append(note_id)
+        self.numbers[note_id] = number
+        self.lengths.append(len(words))
+        self.total_length += len(words)
+        postings = self.postings
+        for word, count in Counter(words).items():
+            posting = postings.get(word)
+            if posting is None:
+                posting = postings[word] = (array('I'), array('H'))
+            posting[0].append(number)
+            posting[1].append(count if count < 0xFFFF else 0xFFFF)
+
+    def dead(self):
+        return len(self.docs) - len(self.numbers)
+
+    def pack(self):
+        """Renumbers the live documents and drops the dead ones from the postings."""
+        renumber = {}
+        docs, lengths = [], array('I')
+        for number, note_id in enumerate(self.docs):
+            if note_id is not None:
+                renumber[number] = len(docs)
+                docs.append(note_id)
+                lengths.append(self.lengths[number])
+        postings = {}
+        for word, (numbers, counts) in self.postings.items():
+            new_numbers, new_counts = array('I'), array('H')
+            for number, count in zip(numbers, counts):
+                if number in renumber:
+                    new_numbers.append(renumber[number])
+                    new_counts.append(count)
+            if new_numbers:
+                postings[word] = (new_numbers, new_counts)
+        self.docs, self.lengths, self.postings = docs, lengths, postings
+        self.numbers = {note_id: number for number, note_id in enumerate(docs)}
+
+    def containing(self, words):
+        """Returns the set of note IDs that contain all the words."""
+        # Пересечение начинается с самого короткого списка документов
+        postings = sorted((self.postings.get(word, ((), ()))[0] for word in set(words)), key=len)
+        if not postings:
+            return set()
+        result = {self.docs[number] for number in postings[0]}
+        for numbers in postings[1:]:
+            if not result:
+                break
+            result &= {self.docs[number] for number in numbers}
+        result.discard(None)
+        return result
+
+    def search(self, words, limit=None, accept=None):
+        """Returns (score, note ID) pairs of the notes with any of the words, best first.
+
+           accept(note_id) may reject candidates, it is called only until
+           limit notes are accepted.
+        """
+        count = len(self.numbers)
+        if not count:
+            return []
+        average = self.total_length / count
+        scores = defaultdict(float)
+        for word in set(words):
+            numbers, counts = self.postings.get(word, ((), ()))
+            live = [(number, tf) for number, tf in zip(numbers, counts) if self.docs[number] is not None]
+            if not live:
+                continue
+            idf = math.log(1 + (count - len(live) + 0.5) / (len(live) + 0.5))
+            for number, tf in live:
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[number] / average)
+                scores[number] += idf * tf * (self.K1 + 1) / (tf + norm)
+        if accept is None and limit is not None:
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        else:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        result = []
+        for number, score in ranked:
+            note_id = self.docs[number]
+            if accept is not None and not accept(note_id):
+                continue
+            result.append((score, note_id))
+            if limit is not None and len(result) == limit:
+                break
+        return result
+
+
+class MentionIndex:
+    """Contact names mentioned in the notes.
+
+       A note mentions a contact when all the words of the name occur in
+       the note one after another (case insensitive). Names are found in a
+       note by their first word, so a note is checked in one pass over its
+       words. The index is updated like the contacts book indexes with
+       update(name, state) and by the notes store with update_note().
+       find_notes(words) is asked for the notes with the words of a name
+       when a new contact is added.
+    """
+
+    def __init__(self, find_notes, generation=None):
+        self.find_notes = find_notes
+        # Поколение индексов заметок, по которому построен индекс
+        self.generation = generation
+        self.name_words = {}
+        self.first_words = defaultdict(set)
+        self.notes = defaultdict(set)
+        self.mentioned = {}
+
+    def update(self, name, state):
+        if state is None:
+            self.remove_name(name)
+        elif name not in self.name_words:
+            words = self.add_name(name)
+            for note_id in self.find_notes(words) if words else ():
+                self.link(name, note_id)
+
+    def add_name(self, name):
+        words = tuple(tokenize(name))
+        self.name_words[name] = words
+        if words:
+            self.first_words[words[0]].add(name)
+        return words
+
+    def remove_name(self, name):
+        words = self.name_words.pop(name, None)
+        if words:
+            self.first_words[words[0]].discard(name)
+            if not self.first_words[words[0]]:
+                del self.first_words[words[0]]
+        for note_id in self.notes.pop(name, ()):
+            names = self.mentioned[note_id]
+            names.discard(name)
+            if not names:
+                del self.mentioned[note_id]
+
+    def link(self, name, note_id):
+        self.notes[name].add(note_id)
+        self.mentioned.setdefault(note_id, set()).add(name)
+
+    def update_note(self, note_id, words):
+        for name in self.mentioned.pop(note_id, ()):
+            self.notes[name].discard(note_id)
+            if not self.notes[name]:
+                del self.notes[name]
+        if not words:
+            return
+        for i, word in enumerate(words):
+            for name in self.first_words.get(word, ()):
+                name_words = self.name_words[name]
+                if tuple(words[i:i + len(name_words)]) == name_words:
+                    self.link(name, note_id)
+
+    def notes_of(self, name):
+        return self.notes.get(name, set())
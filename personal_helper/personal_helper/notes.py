@@ -0,0 +1,798 @@
+"""Storage of the text notes.
+
+   Notes are kept in a plain text file, one note per line:
+
+       21.04.2022 - 19:17:21 :: Text of the note  #tag1  #tag2
+
+   so the file can still be read and edited in any text editor. To avoid
+   rewriting the whole file on every change, NoteStore keeps an index of
+   byte offsets of the notes:
+
+   - a deleted note is marked in place by replacing ' :: ' with ' ~~ ';
+   - a changed note is appended as a new line with the same ID and its
+     previous version is marked as deleted;
+   - compact() rewrites the file without deleted lines, sorted by ID.
+
+   Besides the offsets the index maps every tag to the IDs of the tagged
+   notes, so tag queries are answered without reading the notes file, and
+   keeps the sorted list of note keys (YYYYMMDDhhmmss), so a date range is
+   found with two binary searches and only the notes of the range are read.
+
+   The full-text index (TextIndex) is bigger, so it is kept in its own file
+   note.txt.fts. It is loaded or built the first time the text is searched
+   and from then on is updated together with the notes.
+
+   Notes of old months may be moved with archive_before() into compressed
+   per-month segments (see archive.py). find() reads the segments of the
+   requested dates only; a changed, tagged or deleted archived note brings
+   its whole month back to the notes file first. Archived notes keep their
+   tags and words in the indexes, get() reads them from their segment, so
+   tag and full-text searches still find them.
+
+   Notes created in the same second get IDs with a counter, e.g.
+   '21.04.2022 - 19:17:21.2', so IDs stay unique during bulk imports.
+
+   The index is saved next to the notes file together with the size and
+   modification time of the file and is rebuilt when the file was changed
+   by someone else.
+
+   Parsed notes are cached in memory (up to CACHE_LIMIT notes), so repeated
+   searches do not read the file. The cache is dropped together with the
+   index when the file was changed by someone else and is updated in place
+   by the changes made through the store.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, namedtuple
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+import heapq
+import mmap
+import os
+import pickle
+import re
+
+from .archive import NoteArchive
+from .indexes import TextIndex, tokenize
+
+
+ID_FORMAT = '%d.%m.%Y - %H:%M:%S'
+ID_PATTERN = re.compile(r'\d{2}\.\d{2}\.\d{4} - \d{2}:\d{2}:\d{2}(?:\.[1-9]\d{0,5})?')
+LINE_PATTERN = re.compile(r'(\d{2}\.\d{2}\.\d{4} - \d{2}:\d{2}:\d{2}(?:\.[1-9]\d{0,5})?) (::|~~) (.*)', re.DOTALL)
+TAGS_PATTERN = re.compile(r'(?:  #\S*)+$')
+LIVE = ' :: '
+DELETED = b' ~~ '
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+CACHE_LIMIT = 100000
+# Счетчик заметок одной секунды не длиннее шести цифр, как в ID_PATTERN и id_key
+COUNTER_LIMIT = 999999
+INDEX_VERSION = 5
+TEXT_INDEX_VERSION = 2
+
+
+class Note(namedtuple('Note', 'id created text tags')):
+
+    __slots__ = ()
+
+    def __str__(self):
+        return format_line(self.id, self.text, self.tags)
+
+
+def is_note_id(text):
+    return ID_PATTERN.fullmatch(text) is not None
+
+
+def id_key(note_id):
+    # Ключ сортировки YYYYMMDDhhmmss получается из ID без разбора даты,
+    # счетчик заметок одной секунды дополняется нулями до шести цифр
+    key = (note_id[6:10] + note_id[3:5] + note_id[:2] +
+           note_id[13:15] + note_id[16:18] + note_id[19:21])
+    return key if len(note_id) == 21 else f'{key}.{int(note_id[22:]):06d}'
+
+
+def key_id(key):
+    note_id = f'{key[6:8]}.{key[4:6]}.{key[:4]} - {key[8:10]}:{key[10:12]}:{key[12:14]}'
+    return note_id if len(key) == 14 else f'{note_id}.{int(key[15:])}'
+
+
+def date_key(day, last=False):
+    """Returns the key of the first (or the last) note of the day."""
+    return f'{day.year:04d}{day.month:02d}{day.day:02d}' + ('235959.999999' if last else '000000')
+
+
+def unique_ids(taken, created, count):
+    """Yields count increasing IDs of the created time that are not in taken.
+       When the counter of one second is exhausted, the IDs continue in the next second.
+    """
+    def candidates(moment):
+        while True:
+            base = moment.strftime(ID_FORMAT)
+            yield base
+            for number in range(2, COUNTER_LIMIT + 1):
+                yield f'{base}.{number}'
+            moment += timedelta(seconds=1)
+
+    ids = candidates(created)
+    for _ in range(count):
+        note_id = next(ids)
+        while note_id in taken:
+            note_id = next(ids)
+        yield note_id
+
+
+def id_datetime(note_id):
+    return datetime(int(note_id[6:10]), int(note_id[3:5]), int(note_id[:2]),
+                    int(note_id[13:15]), int(note_id[16:18]), int(note_id[19:21]))
+
+
+def format_line(note_id, text, tags=()):
+    return note_id + LIVE + text + ''.join(f'  #{tag}' for tag in tags)
+
+
+def split_line(line):
+    """Returns (ID, is live, text, tags) of the line or None for a broken line."""
+    match = LINE_PATTERN.fullmatch(line.rstrip('\r\n'))
+    if match is None:
+        return None
+    note_id, body = match.group(1), match.group(3)
+    tags = TAGS_PATTERN.search(body)
+    if tags:
+        return note_id, match.group(2) == '::', body[:tags.start()], tuple(tags.group().split('  #')[1:])
+    return note_id, match.group(2) == '::', body, ()
+
+
+def parse_line(line):
+    """Returns the Note stored in the line or None for deleted and broken lines."""
+    parts = split_line(line)
+    if parts is None or not parts[1]:
+        return None
+    return Note(parts[0], id_datetime(parts[0]), parts[2], parts[3])
+
+
+def tag_key(tag):
+    # Теги сравниваются целиком и без учета регистра, '#' перед тегом необязателен
+    return tag.lstrip('#').lower()
+
+
+def note_words(text, tags):
+    return tokenize(' '.join((text, *tags)))
+
+
+def has_phrase(words, phrase):
+    size = len(phrase)
+    return any(words[i:i + size] == phrase for i in range(len(words) - size + 1))
+
+
+def check_note(text):
+    """Returns the reason why the text can not be a note or None."""
+    if not text.strip():
+        return 'The note is empty.'
+    if '\n' in text or '\r' in text:
+        return 'The note must be one line.'
+    return None
+
+
+def read_notes(fh):
+    """Yields (line number, text, tags, error) for every non-empty line of a binary or text file.
+       Tags may be given at the end of the line in the '  #tag' format.
+    """
+    for number, raw in enumerate(fh, 1):
+        try:
+            line = (raw.decode('utf-8') if isinstance(raw, bytes) else raw).rstrip('\r\n')
+        except UnicodeDecodeError:
+            yield number, None, (), 'The line is not in UTF-8.'
+            continue
+        if not line.strip():
+            continue
+        tags = TAGS_PATTERN.search(line)
+        if tags:
+            yield number, line[:tags.start()], tuple(tags.group().split('  #')[1:]), check_note(line[:tags.start()])
+        else:
+            yield number, line, (), None
+
+
+def matches(note, keyword):
+    """Checks the lowercase keyword against the note; '#tag' is compared with whole tags."""
+    if not keyword:
+        return True
+    if keyword.startswith('#'):
+        return tag_key(keyword) in map(tag_key, note.tags)
+    return keyword in str(note).lower()
+
+
+def decode(raw):
+    return raw.decode('utf-8', errors='replace')
+
+
+@contextmanager
+def mapped(file_name):
+    """Maps the file into memory for reading, gives None for a missing or empty file."""
+    try:
+        fh = open(file_name, 'rb')
+    except FileNotFoundError:
+        yield None
+        return
+    with fh:
+        # Пустой файл отобразить в память нельзя
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def iter_lines(mm):
+    """Yields (offset, raw line) pairs of the mapped file one by one."""
+    size, find = len(mm), mm.find
+    start = 0
+    while start < size:
+        end = find(b'\n', start) + 1 or size
+        yield start, mm[start:end]
+        start = end
+
+
+def line_at(mm, offset):
+    return mm[offset:mm.find(b'\n', offset) + 1 or len(mm)]
+
+
+class NoteStore:
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.index_name = f'{file_name}.idx'
+        self.text_name = f'{file_name}.fts'
+        self.archive = NoteArchive(f'{file_name}.archive')
+        # Разобранные заметки по ключам сортировки
+        self.cache = {}
+        # listener(note_id, words) узнает о каждой новой версии и удалении заметки,
+        # generation меняется, когда индексы перестраиваются из-за изменения файла
+        self.listener = None
+        self.generation = 0
+        # Индекс загружается при первой операции с заметками
+        self.offsets = None
+        self.tags = None
+        self.order = None
+        # ID заархивированных заметок; их теги и слова остаются в индексах
+        self.archived_ids = None
+        self.signature = None
+        self.deleted = 0
+        self.changed = False
+        self.text = None
+        self.text_changed = False
+
+    def create(self):
+        """Creates an empty notes file. Returns False if it already exists."""
+        if os.path.exists(self.file_name):
+            return False
+        open(self.file_name, 'wb').close()
+        return True
+
+    # ---------------------------------- index ----------------------------------
+
+    def file_signature(self):
+        try:
+            stat = os.stat(self.file_name)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def sync(self):
+        """Makes sure the index matches the notes file."""
+        signature = self.file_signature()
+        if self.offsets is not None and signature == self.signature:
+            return
+        if self.offsets is None and self.load_index(signature):
+            return
+        self.rebuild()
+
+    def load_index(self, signature):
+        try:
+            with open(self.index_name, 'rb') as fh:
+                index = pickle.load(fh)
+        except Exception:
+            return False
+        if index.get('version') != INDEX_VERSION or index.get('signature') != signature:
+            return False
+        self.offsets = index['offsets']
+        self.tags = index['tags']
+        self.order = index['order']
+        self.archived_ids = index['archived']
+        self.deleted = index['deleted']
+        self.signature = signature
+        self.changed = False
+        return True
+
+    def save_index(self):
+        if self.changed and self.offsets is not None:
+            dump(self.index_name, {'version': INDEX_VERSION, 'signature': self.signature,
+                                   'offsets': self.offsets, 'tags': self.tags,
+                                   'order': self.order, 'archived': self.archived_ids,
+                                   'deleted': self.deleted})
+            self.changed = False
+        if self.text_changed and self.text is not None:
+            if self.text.dead() > len(self.text):
+                self.text.pack()
+            dump(self.text_name, {'version': TEXT_INDEX_VERSION, 'signature': self.signature,
+                                  'text': self.text})
+            self.text_changed = False
+
+    def load_text(self):
+        """Loads the full-text index saved for the current notes file or builds it."""
+        try:
+            with open(self.text_name, 'rb') as fh:
+                index = pickle.load(fh)
+        except Exception:
+            index = {}
+        if index.get('version') == TEXT_INDEX_VERSION and index.get('signature') == self.signature:
+            self.text = index['text']
+            self.text_changed = False
+        else:
+            self.build_text()
+
+    def build_text(self):
+        self.text = TextIndex()
+        for offset, raw in self.scan():
+            parts = split_line(decode(raw))
+            # Старые версии измененных заметок пропускаются по смещению
+            if parts is not None and self.offsets.get(parts[0]) == offset:
+                self.text.update(parts[0], note_words(parts[2], parts[3]))
+        for parts in self.archived_lines():
+            self.text.update(parts[0], note_words(parts[2], parts[3]))
+        self.text_changed = True
+
+    def open_text(self):
+        # Индекс, который уже есть на диске, обновляется вместе с заметками,
+        # иначе он будет построен при первом поиске по тексту
+        if self.text is None and os.path.exists(self.text_name):
+            self.load_text()
+
+    def rebuild_all(self):
+        """Rebuilds all the indexes from the notes file, e.g. after manual editing."""
+        self.rebuild()
+        self.build_text()
+        self.save_index()
+        return len(self.offsets)
+
+    def rebuild(self):
+        self.text = None
+        self.cache.clear()
+        self.generation += 1
+        self.offsets = {}
+        self.tags = defaultdict(set)
+        self.deleted = 0
+        for offset, raw in self.scan():
+            parts = split_line(decode(raw))
+            if parts is None:
+                continue
+            note_id, live, _, tags = parts
+            if not live:
+                self.deleted += 1
+                continue
+            if note_id in self.offsets:
+                # При повторе ID действительна последняя строка
+                self.deleted += 1
+                self.untag(note_id, self.read(self.offsets[note_id]).tags)
+            self.offsets[note_id] = offset
+            self.tag(note_id, tags)
+        self.order = sorted(map(id_key, self.offsets))
+        self.archived_ids = set()
+        for note_id, live, _, tags in self.archived_lines():
+            self.archived_ids.add(note_id)
+            self.tag(note_id, tags)
+        self.signature = self.file_signature()
+        self.changed = True
+
+    def scan(self):
+        """Yields (offset, raw line) for every line of the notes file.
+           The file is mapped into memory, so its size does not matter.
+        """
+        with mapped(self.file_name) as mm:
+            if mm is not None:
+                yield from iter_lines(mm)
+
+    # --------------------------------- notes ---------------------------------
+
+    def __len__(self):
+        self.sync()
+        return len(self.offsets)
+
+    def __contains__(self, note_id):
+        self.sync()
+        return note_id in self.offsets or self.archived(note_id)
+
+    def get(self, note_id):
+        """Returns the note from the notes file or the archive, None if there is no such note."""
+        self.sync()
+        offset = self.offsets.get(note_id)
+        if offset is None:
+            return self.get_archived(note_id) if note_id in self.archived_ids else None
+        key = id_key(note_id)
+        note = self.cache.get(key)
+        if note is None:
+            note = self.read(offset)
+            self.remember(key, note)
+        return note
+
+    def remember(self, key, note):
+        # Кэш не вытесняет заметки, а просто перестает расти на CACHE_LIMIT
+        if note is not None and len(self.cache) < CACHE_LIMIT:
+            self.cache[key] = note
+
+    def read(self, offset):
+        with open(self.file_name, 'rb') as fh:
+            fh.seek(offset)
+            return parse_line(decode(fh.readline()))
+
+    def between(self, first, last):
+        """Yields the notes with keys from first to last inclusive, sorted by ID."""
+        self.sync()
+        start = bisect_left(self.order, first)
+        stop = bisect_right(self.order, last)
+        if start == stop:
+            return
+        with ExitStack() as stack:
+            mm = None
+            # Срез списка ключей не копируется: на больших диапазонах это лишняя память
+            for i in range(start, stop):
+                key = self.order[i]
+                note = self.cache.get(key)
+                if note is None:
+                    # Файл открывается, только если нужной заметки нет в кэше
+                    if mm is None:
+                        mm = stack.enter_context(mapped(self.file_name))
+                    note = parse_line(decode(line_at(mm, self.offsets[key_id(key)])))
+                    if note is None:
+                        continue
+                    self.remember(key, note)
+                yield note
+
+    def find(self, keyword='', first=None, last=None):
+        """Yields the notes created from the first to the last date inclusive
+           that contain the keyword, sorted by ID. Dates may be None.
+        """
+        first = '' if first is None else date_key(first)
+        last = '~' if last is None else date_key(last, last=True)
+        keyword = keyword.lower()
+        # Сегменты архива вне диапазона дат не открываются
+        streams = [self.archived_between(month, first, last) for month in self.archive.months_between(first, last)]
+        if streams:
+            notes = heapq.merge(self.between(first, last), *streams, key=lambda note: id_key(note.id))
+        else:
+            notes = self.between(first, last)
+        return (note for note in notes if matches(note, keyword))
+
+    # -------------------------------- archive --------------------------------
+
+    def archived_between(self, month, first, last):
+        for raw in self.archive.read(month):
+            note = parse_line(decode(raw))
+            if note is None:
+                continue
+            key = id_key(note.id)
+            # Строки сегмента отсортированы, после конца диапазона читать дальше незачем
+            if key > last:
+                break
+            if key >= first:
+                yield note
+
+    def archived(self, note_id):
+        self.sync()
+        return note_id in self.archived_ids
+
+    def archived_lines(self):
+        """Yields (ID, is live, text, tags) of the live lines of all the archive segments."""
+        for month in sorted(self.archive.load()):
+            for raw in self.archive.read(month):
+                parts = split_line(decode(raw))
+                if parts is not None and parts[1]:
+                    yield parts
+
+    def get_archived(self, note_id):
+        key = id_key(note_id)
+        note = self.cache.get(key)
+        if note is not None:
+            return note
+        # Сегмент читается целиком, поэтому в кэш попадают все заметки месяца:
+        # результаты find tag и find text часто относятся к одним и тем же месяцам
+        for archived_note in self.archived_between(key[:6], '', '~'):
+            archived_key = id_key(archived_note.id)
+            self.remember(archived_key, archived_note)
+            if archived_key == key:
+                note = archived_note
+        return note
+
+    def archive_before(self, day):
+        """Moves the notes created before the day into compressed month segments.
+           Returns the number of archived notes.
+        """
+        self.sync()
+        self.open_text()
+        stop = bisect_left(self.order, date_key(day))
+        if not stop:
+            return 0
+        months = defaultdict(list)
+        with mapped(self.file_name) as mm:
+            for key in self.order[:stop]:
+                note_id = key_id(key)
+                raw = line_at(mm, self.offsets[note_id])
+                months[key[:6]].append((key, raw if raw.endswith(b'\n') else raw + b'\n'))
+        for month, lines in months.items():
+            if month in self.archive:
+                lines.extend((id_key(split_line(decode(raw))[0]), raw) for raw in self.archive.read(month))
+                lines.sort()
+            self.archive.write(month, [raw for key, raw in lines], lines[0][0], lines[-1][0])
+            for key, raw in lines:
+                note_id = key_id(key)
+                # Теги, слова и упоминания заметки остаются в индексах, get() читает ее из архива
+                self.offsets.pop(note_id, None)
+                self.archived_ids.add(note_id)
+        del self.order[:stop]
+        self.changed = True
+        # Заархивированные строки удаляются из файла заметок при его перезаписи
+        self.compact()
+        return stop
+
+    def thaw(self, note_id):
+        """Moves the archived month of the note back to the notes file.
+           Returns False if the note is not in the archive.
+        """
+        if not self.archived(note_id):
+            return False
+        self.open_text()
+        month = id_key(note_id)[:6]
+        entries = []
+        for raw in self.archive.read(month):
+            parts = split_line(decode(raw))
+            if parts is not None and parts[1]:
+                entries.append((parts[0], parts[2], parts[3]))
+        self.write_many(entries, sync=True)
+        self.archived_ids.difference_update(note_id for note_id, text, tags in entries)
+        self.archive.remove(month)
+        return True
+
+    def locate(self, note_id):
+        """Checks that the note is in the notes file, bringing it back from the archive if needed."""
+        self.sync()
+        return note_id in self.offsets or self.thaw(note_id)
+
+    def iter_notes(self):
+        """Yields all the notes in the order of the file."""
+        self.sync()
+        for offset, raw in self.scan():
+            note = parse_line(decode(raw))
+            if note is not None:
+                yield note
+
+    def add(self, text, created=None):
+        self.sync()
+        self.open_text()
+        note_id = next(unique_ids(self.offsets, created or datetime.now(), 1))
+        self.write(note_id, text)
+        return note_id
+
+    def add_many(self, notes, created=None):
+        """Adds (text, tags) pairs as new notes with one write and one fsync.
+           All the notes get the same time, so they keep their order.
+           Returns the list of the new IDs.
+        """
+        self.sync()
+        self.open_text()
+        notes = list(notes)
+        ids = list(unique_ids(self.offsets, created or datetime.now(), len(notes)))
+        self.write_many([(note_id, text, tags) for note_id, (text, tags) in zip(ids, notes)], sync=True)
+        return ids
+
+    def replace(self, note_id, text, tags=()):
+        """Replaces the note with a new version. Returns False if there is no such note."""
+        if not self.locate(note_id):
+            return False
+        self.open_text()
+        old_offset = self.offsets[note_id]
+        self.untag(note_id, self.get(note_id).tags)
+        # Сначала дописывается новая версия: при сбое между двумя записями заметка не теряется
+        self.write(note_id, text, tags)
+        self.mark_deleted(note_id, old_offset)
+        return True
+
+    def add_tag(self, note_id, tag):
+        if not self.locate(note_id):
+            return False
+        note = self.get(note_id)
+        if note is None:
+            return False
+        return self.replace(note_id, note.text, note.tags + (tag,))
+
+    def delete(self, note_id):
+        if not self.locate(note_id):
+            return False
+        self.open_text()
+        self.untag(note_id, self.get(note_id).tags)
+        offset = self.offsets.pop(note_id)
+        self.cache.pop(id_key(note_id), None)
+        del self.order[bisect_left(self.order, id_key(note_id))]
+        self.mark_deleted(note_id, offset)
+        if self.text is not None:
+            self.text.update(note_id, None)
+            self.text_changed = True
+        if self.listener is not None:
+            self.listener(note_id, None)
+        return True
+
+    def write(self, note_id, text, tags=()):
+        self.write_many([(note_id, text, tags)])
+
+    def write_many(self, entries, sync=False):
+        """Appends (ID, text, tags) lines to the file with one write and updates the indexes."""
+        lines = [f'{format_line(note_id, text, tags)}\n'.encode('utf-8') for note_id, text, tags in entries]
+        with open(self.file_name, 'ab') as fh:
+            offset = fh.seek(0, os.SEEK_END)
+            fh.write(b''.join(lines))
+            if sync:
+                fh.flush()
+                os.fsync(fh.fileno())
+        # Индексы обновляются только после успешной записи
+        for (note_id, text, tags), line in zip(entries, lines):
+            key = id_key(note_id)
+            if note_id not in self.offsets:
+                # Новые заметки почти всегда самые поздние, insort добавляет их в конец
+                insort(self.order, key)
+            self.cache.pop(key, None)
+            self.remember(key, Note(note_id, id_datetime(note_id), text, tuple(tags)))
+            self.offsets[note_id] = offset
+            offset += len(line)
+            self.tag(note_id, tags)
+            if self.text is not None:
+                self.text.update(note_id, note_words(text, tags))
+                self.text_changed = True
+            if self.listener is not None:
+                self.listener(note_id, note_words(text, tags))
+        self.after_write()
+
+    def mark_deleted(self, note_id, offset):
+        with open(self.file_name, 'r+b') as fh:
+            fh.seek(offset + len(note_id.encode('utf-8')))
+            fh.write(DELETED)
+        self.deleted += 1
+        self.after_write()
+
+    def tag(self, note_id, tags):
+        for tag in tags:
+            self.tags[tag_key(tag)].add(note_id)
+
+    def untag(self, note_id, tags):
+        for tag in tags:
+            key = tag_key(tag)
+            self.tags[key].discard(note_id)
+            if not self.tags[key]:
+                del self.tags[key]
+
+    def after_write(self):
+        self.signature = self.file_signature()
+        self.changed = True
+
+    def compact(self):
+        """Rewrites the notes file without deleted lines, sorted by ID.
+           Returns the number of removed lines.
+        """
+        self.sync()
+        # Подпись файла изменится, поэтому полнотекстовый индекс сохраняется заново
+        self.open_text()
+        self.text_changed = self.text is not None
+        removed = self.deleted
+        tmp_name = f'{self.file_name}.tmp'
+        offsets = {}
+        with open(self.file_name, 'rb') as source, open(tmp_name, 'wb') as target:
+            for note_id in sorted(self.offsets, key=id_key):
+                source.seek(self.offsets[note_id])
+                raw = source.readline()
+                offsets[note_id] = target.tell()
+                target.write(raw if raw.endswith(b'\n') else raw + b'\n')
+        os.replace(tmp_name, self.file_name)
+        self.offsets = offsets
+        self.deleted = 0
+        self.after_write()
+        self.save_index()
+        return removed
+
+    # ---------------------------------- tags ----------------------------------
+
+    def tag_counts(self):
+        """Returns (tag, number of notes) pairs sorted by tag."""
+        self.sync()
+        return sorted((tag, len(ids)) for tag, ids in self.tags.items())
+
+    def find_tags(self, words):
+        """Returns sorted IDs of the notes matching a query like 'work AND urgent OR home NOT done'.
+
+           NOT binds to the next tag, AND (also implied between tags) binds
+           stronger than OR. Raises ValueError for a wrong query.
+        """
+        self.sync()
+        found = set()
+        for group in split_groups(words):
+            include, exclude = [], set()
+            negate = False
+            for word in group:
+                if word.upper() == 'NOT':
+                    negate = True
+                    continue
+                ids = self.tags.get(tag_key(word), set())
+                if negate:
+                    exclude |= ids
+                else:
+                    include.append(ids)
+                negate = False
+            if negate:
+                raise ValueError('NOT must be followed by a tag.')
+            if include:
+                ids = set.intersection(*sorted(include, key=len))
+            else:
+                # Группа только с NOT выбирает все заметки, кроме исключенных
+                ids = set(self.offsets) | self.archived_ids
+            found |= ids - exclude
+        return sorted(found, key=id_key)
+
+    # ------------------------------- full text -------------------------------
+
+    def search_text(self, query, limit=None):
+        """Returns (score, note) pairs ranked by BM25, best first.
+
+           Words in double quotes form a phrase that must occur in the note
+           as is, other words are optional and only raise the score.
+        """
+        self.sync()
+        if self.text is None:
+            self.load_text()
+        phrases = [tokenize(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        words = tokenize(query)
+        found = {}
+
+        def accept(note_id):
+            note = found[note_id] = self.get(note_id)
+            if note is None:
+                return False
+            note_text = note_words(note.text, note.tags)
+            return all(has_phrase(note_text, phrase) for phrase in phrases)
+
+        if phrases:
+            # Кандидаты на фразу - заметки, в которых есть все ее слова
+            required = self.text.containing([word for phrase in phrases for word in phrase])
+
+            def check(note_id):
+                return note_id in required and accept(note_id)
+        else:
+            check = accept
+        return [(score, found[note_id]) for score, note_id in self.text.search(words, limit, check)]
+
+    def find_phrase(self, words):
+        """Returns the IDs of the notes (archived ones too) where the words occur one after another."""
+        self.sync()
+        if self.text is None:
+            self.load_text()
+        found = []
+        for note_id in self.text.containing(words):
+            note = self.get(note_id)
+            if note is not None and has_phrase(note_words(note.text, note.tags), list(words)):
+                found.append(note_id)
+        return found
+
+
+def dump(file_name, data):
+    tmp_name = f'{file_name}.tmp'
+    with open(tmp_name, 'wb') as fh:
+        pickle.dump(data, fh)
+    os.replace(tmp_name, file_name)
+
+
+def split_groups(words):
+    """Splits the query by OR into groups of tags, dropping AND."""
+    groups = [[]]
+    for word in words:
+        operator = word.upper()
+        if operator == 'OR':
+            groups.append([])
+        elif operator != 'AND':
+            groups[-1].append(word)
+    if any(not group or all(word.upper() == 'NOT' for word in group) for group in groups):
+        raise ValueError('Tags are missing around AND/OR.')
+    return groups
@@ -1,31 +1,63 @@
+# Время начала импорта берется до остальных импортов модуля, чтобы --startup-time
+# учитывал и их; поэтому эти две строки стоят перед блоком импортов
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import contextlib
 from collections import UserDict, defaultdict
-from datetime import datetime, timedelta
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
+from itertools import chain, islice
 import os.path
-import pickle
 import re
-from . import clean
+import sys
+import threading
+from .indexes import BirthdayIndex, EmailIndex, MentionIndex, PhoneIndex, TrigramIndex
+from .notes import NoteStore, id_key, is_note_id, read_notes
+from .storage import SQLiteRecords, open_storage
 
 # --------------------------------Prompt Toolkit-------------------------------
-from prompt_toolkit import prompt
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.completion import WordCompleter
-from prompt_toolkit.lexers import PygmentsLexer
-from prompt_toolkit.styles import Style
-
-SqlCompleter = WordCompleter([
+# Prompt Toolkit импортируется при первом запросе команды, а не при запуске модуля
+COMPLETER_WORDS = [
     'add', 'close', 'exit', 'save', 'remove', 'add address', 'add birthday', 'add email', 'add phone',
     'delete address', 'delete birthday', 'delete email', 'delete phone',
     'change email', 'change birthday', 'change address', 'change phone',
     'coming birthday', 'good bye', "add note", "find note", "change note",
-    "delete note", "tag note", "help", 'show all', 'search', 'clean'], ignore_case=True)
+    "delete note", "tag note", "help", 'show all', 'search', 'find phone', 'find email',
+    'clean', 'import', 'export', "find tag", "find text", "compact notes", "rebuild notes",
+    "import notes", "archive notes"]
 
-style = Style.from_dict({
+STYLE = {
     'completion-menu.completion': 'bg:#008888 #ffffff',
     'completion-menu.completion.current': 'bg:#00aaaa #000000',
     'scrollbar.background': 'bg:#88aaaa',
     'scrollbar.button': 'bg:#222222',
-})
+}
+
+prompt_options = {}
+
+
+def get_prompt_options():
+    if not prompt_options:
+        from prompt_toolkit.history import FileHistory
+        from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+        from prompt_toolkit.completion import WordCompleter
+        from prompt_toolkit.styles import Style
+
+        prompt_options.update(history=FileHistory('history'),
+                              auto_suggest=AutoSuggestFromHistory(),
+                              completer=WordCompleter(COMPLETER_WORDS, ignore_case=True),
+                              style=Style.from_dict(STYLE))
+    return prompt_options
+
+
+def read_command():
+    if not sys.stdin.isatty():
+        # Команды из скрипта или конвейера читаются без Prompt Toolkit
+        return input()
+    from prompt_toolkit import prompt
+
+    return prompt('>>> ', **get_prompt_options())
 # --------------------------------Prompt Toolkit-------------------------------
 
 
@@ -34,8 +66,72 @@ class CustomException(Exception):
         self.txt = text
 
 
+# Сколько записей выводится за один раз при потоковом выводе книги
+RENDER_CHUNK_SIZE = 50
+PAGE_SIZE = 10
+# Сколько ошибок импорта выводится построчно
+IMPORT_ERRORS_SHOWN = 20
+# Заметки старше стольких месяцев команда archive notes переносит в архив по умолчанию
+ARCHIVE_MONTHS = 3
+
+
 class AddressBook(UserDict):
 
+    # Индексы строятся при первом обращении и дальше обновляются при каждом изменении записей
+    INDEX_TYPES = {'text': TrigramIndex, 'phone': PhoneIndex, 'email': EmailIndex,
+                   'birthday': BirthdayIndex}
+
+    def __init__(self, *args, **kwargs):
+        self.storage = None
+        self.indexes = {}
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, name, record):
+        self._attach(record)
+        self.data[name] = record
+        self._record_changed(record)
+
+    def __delitem__(self, name):
+        record = self.data.pop(name)
+        record._book = None
+        if self.storage:
+            self.storage.touch(name)
+        for index in self.indexes.values():
+            index.update(name, None)
+
+    def _attach(self, record):
+        record._book = self
+        return record
+
+    def _materialize(self, state):
+        return self._attach(Record.from_state(state))
+
+    def _record_changed(self, record):
+        if self.storage:
+            self.storage.touch(record.name, record)
+        if self.indexes:
+            state = record.to_state()
+            for index in self.indexes.values():
+                index.update(record.name, state)
+
+    def get_index(self, kind):
+        if kind not in self.indexes:
+            index = self.INDEX_TYPES[kind]()
+            for state in self.iter_states():
+                index.update(state['name'], state)
+            self.indexes[kind] = index
+        return self.indexes[kind]
+
+    def iter_states(self):
+        if isinstance(self.data, SQLiteRecords):
+            # Индекс строится по строкам базы без создания объектов Record
+            return self.data.states()
+        return (record.to_state() for record in self.data.values())
+
+    def add_records(self, records):
+        for record in records:
+            self[record.name] = record
+
     def get_values_list(self):
         if self.data:
             return self.data.values()
@@ -51,64 +147,188 @@ class AddressBook(UserDict):
 
     def remove(self, name):
         if self.data.get(name):
-            self.data.pop(name)
+            del self[name]
         else:
             raise CustomException(
                 'Such contact  doesn\'t exist.')
 
     def load_from_file(self, file_name):
-        if os.path.exists(file_name):
-            with open(file_name, 'rb') as fh:
-                self.data = pickle.load(fh)
-                if len(self.data):
-                    return f'The contacts book is loaded from the file "{file_name}".'
-                else:
-                    return "This is empty contacts book. Add contacts to it using the command 'add < NAME > '."
+        self.storage = open_storage(file_name)
+        self.data = self.storage.load(self)
+        self.indexes = {}
+        if len(self.data):
+            return f'The contacts book is loaded from the file "{file_name}".'
         else:
             return "This is empty contacts book. Add contacts into it using the command 'add <NAME>'."
 
     def save_to_file(self, file_name):
-        with open(file_name, 'wb') as fh:
-            pickle.dump(self.data, fh)
+        if self.storage and self.storage.file_name == file_name:
+            self.storage.save(self.data)
+        else:
+            self.storage = open_storage(file_name)
+            self.storage.compact(self.data)
+            self.data = self.storage.load(self)
+            self.indexes = {}
         return f'The contacts book is saved in the file "{file_name}".'
 
-    def search(self, query):
-        result = AddressBook()
-        for key in self.data.keys():
-            if query.lower() in str(self.get_record(key)).lower():
-                match = self.get_record(key)
-                result[key] = match
-        if len(result) > 0:
-            return f'{len(result)} records found:\n {result}'
-        else:
+    def search(self, query, limit=None):
+        return self._found(self.search_names(query), limit)
+
+    def search_names(self, query):
+        return self.get_index('text').search(query)
+
+    def find_by(self, kind, value):
+        return self._found(self.get_index(kind).lookup(value))
+
+    def owners(self, kind, value, exclude=None):
+        return [name for name in self.get_index(kind).lookup(value) if name != exclude]
+
+    def _found(self, names, limit=None):
+        if not names:
             return f'No records found.'
+        if limit is not None and limit < len(names):
+            header = f'{len(names)} records found, the first {limit} are shown:\n '
+            names = names[:limit]
+        else:
+            header = f'{len(names)} records found:\n '
+        return chain([header], self.render(names))
+
+    def render(self, names=None, chunk_size=RENDER_CHUNK_SIZE):
+        """Отдает записи с указанными именами (по умолчанию все) частями по chunk_size
+           записей, чтобы вывод начинался, не дожидаясь отрисовки всей книги
+        """
+        chunk = []
+        for key in (self.data.keys() if names is None else names):
+            chunk.append(str(self.data[key]))
+            if len(chunk) == chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    def page(self, number, size):
+        return self.render(islice(self.data.keys(), (number - 1) * size, number * size))
 
     def __repr__(self):
-        result = ""
-        for key in self.data.keys():
-            result += str(self.data.get(key))
-        return result
+        return ''.join(self.render())
+
 
+# Файл с расширением .db, .sqlite или .sqlite3 хранит книгу в базе SQLite
+CONTACTS_FILE = os.environ.get('PERSONAL_HELPER_CONTACTS',
+                               f"{os.path.dirname(os.path.abspath(__file__))}/contacts.bin")
 
 contacts = AddressBook()
 
+NOTES_FILE = f"{os.path.dirname(os.path.abspath(__file__))}/note.txt"
+
+notes = NoteStore(NOTES_FILE)
+
+
+PHONE_PATTERN = re.compile(r'\(0\d{2}\)\d{3}-\d{2}-\d{2}')
+EMAIL_PATTERN = re.compile(r'[a-zA-Z][\w.]+@[a-zA-z]+\.[a-zA-Z]{2,}')
+DATE_PATTERN = re.compile(r'\d{2}\.\d{2}\.\d{4}')
+NON_DIGITS = re.compile(r'\D')
+
+
+def parse_date(text):
+    # Разбор без strptime в несколько раз быстрее, что заметно при загрузке и импорте
+    if not DATE_PATTERN.fullmatch(text):
+        raise ValueError(f'{text} does not match format DD.MM.YYYY')
+    return date(int(text[6:]), int(text[3:5]), int(text[:2]))
+
+
+def pack_phone(phone):
+    # (0XX)XXX-XX-XX хранится как число из десяти цифр без ведущего нуля,
+    # лишние символы вокруг номера (например, +38) отбрасываются
+    match = PHONE_PATTERN.search(phone)
+    if match is None:
+        # Строка без такого номера (из старой книги) хранится как есть, чтобы не исказить ее
+        return phone
+    return int(NON_DIGITS.sub('', match.group()))
+
+
+def unpack_phone(number):
+    if isinstance(number, str):
+        return number
+    if not 0 <= number < 10 ** 10:
+        raise ValueError(f'Phone number {number} is longer than 10 digits.')
+    digits = f'{number:010d}'
+    return f'({digits[:3]}){digits[3:6]}-{digits[6:8]}-{digits[8:]}'
+
 
 class Record:
 
+    # Без __dict__ запись занимает в несколько раз меньше памяти: телефоны хранятся
+    # кортежем чисел, дата рождения - порядковым номером дня, пустые поля - None
+    __slots__ = ('name', '_address', '_phones', '_email', '_birthday', '_book')
+
     def __init__(self, name, address=None, phones_list=None, email=None, birthday=None):
-        self.name = name
+        self.name = sys.intern(name)
         self._address = address
-        self._phones_list = []
+        self._phones = tuple(pack_phone(phone) for phone in phones_list) if phones_list else ()
         self._email = email
+        self._birthday = parse_date(birthday).toordinal() if birthday else None
+        # Книга, в которой хранится запись; ей сообщается о каждом изменении
+        self._book = None
+
+    def __getstate__(self):
+        return {'name': self.name, '_address': self._address, '_phones': self._phones,
+                '_email': self._email, '_birthday': self._birthday}
+
+    def __setstate__(self, state):
+        self.name = sys.intern(state['name'])
+        self._address = state['_address']
+        self._email = state['_email']
+        if '_phones' in state:
+            self._phones = state['_phones']
+        else:
+            # Книги, сохраненные до упаковки записей, хранят телефоны списком строк,
+            # в которых номер (0XX)XXX-XX-XX мог быть окружен другими символами
+            self._phones = tuple(pack_phone(phone) for phone in state['_phones_list'])
+        birthday = state['_birthday']
+        if isinstance(birthday, str):
+            birthday = parse_date(birthday)
+        if isinstance(birthday, date):
+            birthday = birthday.toordinal()
         self._birthday = birthday
+        self._book = None
+
+    def to_state(self):
+        return {'name': self.name, 'address': self.address, 'phones': self.phones_list,
+                'email': self.email, 'birthday': self.birthday}
+
+    @classmethod
+    def from_state(cls, state):
+        # Данные из хранилища уже проверены, поэтому записываются без валидации
+        return cls(state['name'], state['address'], state['phones'], state['email'],
+                   state['birthday'])
+
+    def _changed(self):
+        if self._book is not None:
+            self._book._record_changed(self)
 
     def append_phone(self, phone):
-        if re.search('\(0\d{2}\)\d{3}-\d{2}-\d{2}', phone):
-            self._phones_list.append(phone)
+        match = PHONE_PATTERN.search(phone)
+        if match:
+            self._phones += (pack_phone(match.group()),)
+            self._changed()
         else:
             raise CustomException(
                 'Wrong phone number format! Use (0XX)XXX-XX-XX format!')
 
+    def delete_phone(self, phone):
+        phones = list(self._phones)
+        phones.remove(pack_phone(phone))
+        self._phones = tuple(phones)
+        self._changed()
+
+    def change_phone(self, old_phone, new_phone):
+        phones = list(self._phones)
+        phones[phones.index(pack_phone(old_phone))] = pack_phone(
+            PHONE_PATTERN.search(new_phone).group())
+        self._phones = tuple(phones)
+        self._changed()
+
     @property
     def address(self):
         return self._address
@@ -116,13 +336,15 @@ class Record:
     @address.setter
     def address(self, address):
         self._address = address
+        self._changed()
 
     def delete_address(self):
         self._address = None
+        self._changed()
 
     @property
     def phones_list(self):
-        return self._phones_list
+        return [unpack_phone(number) for number in self._phones]
 
     @property
     def email(self):
@@ -130,29 +352,37 @@ class Record:
 
     @email.setter
     def email(self, email):
-        if re.search('[a-zA-Z][\w.]+@[a-zA-z]+\.[a-zA-Z]{2,}', email):
+        if EMAIL_PATTERN.search(email):
             self._email = email
+            self._changed()
         else:
             raise CustomException(
                 'Wrong email format! Correct format is aaaa@ddd.cc')
 
     def delete_email(self):
         self._email = None
+        self._changed()
 
     @property
     def birthday(self):
-        return self._birthday
+        return self.birthday_date.strftime('%d.%m.%Y') if self._birthday else None
 
     @birthday.setter
     def birthday(self, birthday):
-        if re.search('\d{2}\.\d{2}.\d{4}', birthday) and datetime.strptime(birthday, '%d.%m.%Y'):
-            self._birthday = birthday
+        if DATE_PATTERN.search(birthday):
+            self._birthday = parse_date(birthday).toordinal()
+            self._changed()
         else:
             raise CustomException(
                 'Wrong date format! Correct format is DD.MM.YYYY')
 
+    @property
+    def birthday_date(self):
+        return date.fromordinal(self._birthday) if self._birthday else None
+
     def delete_birthday(self):
         self._birthday = None
+        self._changed()
 
     def __repr__(self):
         name = self.name
@@ -170,44 +400,77 @@ class Record:
 
 def input_error(func):
 
+    def error_text(exc):
+
+        if func.__name__ == 'save_func':
+            return f'Error while saving.'
+        elif func.__name__ == 'add_birthday':
+            return "Day out of range for this month."
+        elif func.__name__ == 'coming_birthday' and exc.__class__.__name__ == "ValueError":
+            return "Use a number for getting list of birthdays more than next 7 days."
+        elif func.__name__ == 'remove':
+            return f'Error while removing record.'
+        elif func.__name__ == 'change_address':
+            return f'Error while changing address.'
+        elif func.__name__ == 'change_birthday':
+            return f'Error while changing birthday.'
+        elif func.__name__ == 'change_email':
+            return f'Error while changing email.'
+        elif func.__name__ == 'change_phone':
+            return f'Error while changing phone.'
+        elif func.__name__ == 'delete_address':
+            return f'Error while deleting address.'
+        elif func.__name__ == 'delete_birthday':
+            return f'Error while deleting birthday.'
+        elif func.__name__ == 'delete_email':
+            return f'Error while deleting email.'
+        elif func.__name__ == 'delete_phone':
+            return f'Error while deleting phone.'
+        elif func.__name__ in ('search', 'find_phone', 'find_email'):
+            return f'Error while searching.'
+        elif func.__name__ == 'import_func':
+            return f'Error while importing contacts.'
+        elif func.__name__ == 'export_func':
+            return f'Error while exporting contacts.'
+        elif func.__name__ == 'find_tag':
+            return f'Error while searching notes by tags.'
+        elif func.__name__ in ('find_note', 'find_text'):
+            return f'Error while searching notes.'
+        elif func.__name__ == 'rebuild_notes':
+            return f'Error while rebuilding notes indexes.'
+        elif func.__name__ == 'import_notes':
+            return f'Error while importing notes.'
+        elif func.__name__ == 'archive_notes':
+            return f'Error while archiving notes.'
+        elif func.__name__ == 'compact_notes':
+            return f'Error while compacting notes.'
+        elif func.__name__ == 'clean_func':
+            return f'Error while cleaning the folder.'
+
+        return 'Error while running the command.'
+
+    def guarded(chunks):
+        # Потоковый вывод отрисовывается уже после возврата из команды, поэтому ошибки
+        # при его отрисовке перехватываются здесь, а не ломают главный цикл
+        try:
+            yield from chunks
+        except CustomException as warning_text:
+            yield f'\n{warning_text}'
+        except Exception as exc:
+            yield f'\n{error_text(exc)}'
+
     def inner(command_line):
 
         try:
             result = func(command_line)
+            if isinstance(result, Iterator):
+                result = guarded(result)
 
         except CustomException as warning_text:
             result = warning_text
 
         except Exception as exc:
-
-            if func.__name__ == 'save_func':
-                result = f'Error while saving.'
-            elif func.__name__ == 'add_birthday':
-                result = "Day out of range for this month."
-            elif func.__name__ == 'coming_birthday' and exc.__class__.__name__ == "ValueError":
-                result = "Use a number for getting list of birthdays more than next 7 days."
-            elif func.__name__ == 'remove':
-                result = f'Error while removing record.'
-            elif func.__name__ == 'change_address':
-                result = f'Error while changing address.'
-            elif func.__name__ == 'change_birthday':
-                result = f'Error while changing birthday.'
-            elif func.__name__ == 'change_email':
-                result = f'Error while changing email.'
-            elif func.__name__ == 'change_phone':
-                result = f'Error while changing phone.'
-            elif func.__name__ == 'delete_address':
-                result = f'Error while deleting address.'
-            elif func.__name__ == 'delete_birthday':
-                result = f'Error while deleting birthday.'
-            elif func.__name__ == 'delete_email':
-                result = f'Error while deleting email.'
-            elif func.__name__ == 'delete_phone':
-                result = f'Error while deleting phone.'
-            elif func.__name__ == 'search':
-                result = f'Error while searching.'
-            elif func.__name__ == 'clean_func':
-                result = f'Error while cleaning the folder.'
+            result = error_text(exc)
 
         return result
 
@@ -223,7 +486,7 @@ def exit_func(command_line):
 @input_error
 def save_func(command_line):
 
-    return contacts.save_to_file('contacts.bin')
+    return contacts.save_to_file(CONTACTS_FILE)
 
 
 def prepare_value(command_line):
@@ -287,6 +550,10 @@ def add_email(command_line):
 def add_phone(command_line):
     key, phone = prepare_value(command_line)
     if not phone in contacts.get_record(key).phones_list:
+        owners = contacts.owners('phone', phone, exclude=key)
+        if owners:
+            raise CustomException(
+                f'Phone number {phone} already belongs to the contact "{owners[0]}"!')
         contacts.get_record(key).append_phone(phone)
         return f'Phone number {phone} for the contact "{key}" has been successfully added.'
     else:
@@ -295,9 +562,9 @@ def add_phone(command_line):
 
 def create_for_print(birthdays_dict):
     to_show = []
-    for date, names in list(birthdays_dict.items()):
+    for day, names in list(birthdays_dict.items()):
         to_show.append(
-            f'{date.strftime("%A")}({date.strftime("%d.%m.%Y")}): {", ".join(names)}')
+            f'{day.strftime("%A")}({day.strftime("%d.%m.%Y")}): {", ".join(names)}')
     if len(to_show) == 0:
         return f'There are no birthdays coming within this period.'
     else:
@@ -311,26 +578,84 @@ def coming_birthday(command_line):
     birthdays_dict = defaultdict(list)
     if command_line:
         range_days = int(command_line[0])
+    if not contacts.data:
+        raise CustomException('Address book is empty.')
     current_date = datetime.now().date()
     timedelta_filter = timedelta(days=range_days)
-    for name, birthday in [(i.name, i.birthday) for i in contacts.get_values_list()]:
-        if name and birthday:  # проверка на None
-            birthday_date = datetime.strptime(birthday, '%d.%m.%Y').date()
-            current_birthday = birthday_date.replace(year=current_date.year)
-            if current_date <= current_birthday <= current_date + timedelta_filter:
-                birthdays_dict[current_birthday].append(name)
+    # Индекс сам учитывает переход через Новый год и 29 февраля
+    for current_birthday, name in contacts.get_index('birthday').between(
+            current_date, current_date + timedelta_filter):
+        birthdays_dict[current_birthday].append(name)
     return create_for_print(birthdays_dict)
 
 
+def pop_number(command_line, option, what):
+    """Убирает из команды опцию вида --limit N и возвращает N или None."""
+    if option not in command_line:
+        return None
+    ix = command_line.index(option)
+    if ix + 1 == len(command_line) or not command_line[ix + 1].isdigit():
+        raise CustomException(f'Specify the number of {what} after {option}.')
+    number = int(command_line.pop(ix + 1))
+    command_line.pop(ix)
+    return number
+
+
 @input_error
 def search(command_line):
     #key, value = prepare_value(command_line)
+    limit = pop_number(command_line, '--limit', 'records')
     if command_line:
-        return contacts.search(' '.join(command_line).strip())
+        query = ' '.join(command_line).strip()
+        result = contacts.search(query, limit)
+        if isinstance(result, str):
+            return result
+        # после найденных записей выводятся заметки, в которых упоминаются эти контакты
+        return chain(result, linked_notes(contacts.search_names(query)[:limit]))
     else:
         return 'Specify the search string.'
 
 
+def get_mentions():
+    """Индекс упоминаний контактов в заметках строится при первом поиске, дальше его
+       обновляют книга контактов (как свои индексы) и хранилище заметок. Заметки каждого
+       контакта ищутся по сохраненному полнотекстовому индексу, без чтения всего note.txt
+    """
+    notes.sync()
+    index = contacts.indexes.get('notes')
+    if index is None or index.generation != notes.generation:
+        index = MentionIndex(notes.find_phrase, notes.generation)
+        for state in contacts.iter_states():
+            index.update(state['name'], state)
+        contacts.indexes['notes'] = index
+        notes.listener = index.update_note
+    return index
+
+
+def linked_notes(names):
+    mentions = get_mentions()
+    for name in names:
+        ids = mentions.notes_of(name)
+        if ids:
+            yield f'\nNotes about {name}:\n' + ''.join(f'{notes.get(note_id)}\n' for note_id in sorted(ids, key=id_key))
+
+
+@input_error
+def find_phone(command_line):
+    if command_line:
+        return contacts.find_by('phone', ''.join(command_line))
+    else:
+        return 'Specify the phone number.'
+
+
+@input_error
+def find_email(command_line):
+    if command_line:
+        return contacts.find_by('email', ''.join(command_line))
+    else:
+        return 'Specify the email.'
+
+
 @input_error
 def remove(command_line):
     key = ' '.join(command_line).strip()
@@ -378,9 +703,7 @@ def delete_email(command_line):
 def delete_phone(command_line):
     key, phone = prepare_value(command_line)
     if phone in contacts.get_record(key).phones_list:
-        ix = contacts.get_record(key).phones_list.index(phone)
-        if ix >= 0:
-            contacts.get_record(key).phones_list.pop(ix)
+        contacts.get_record(key).delete_phone(phone)
         return f'Phone number {phone} for the contact "{key}" has been successfully deleted.'
     else:
         raise CustomException('Such phone number does not exist!!!')
@@ -430,11 +753,13 @@ def change_phone(command_line):
         raise CustomException(
             '''The command must be with a NAME and 2 phones you want to change 
             (Format: <change> <name> <old phone> <new phone>)''')
-    if re.search('\(0\d{2}\)\d{3}-\d{2}-\d{2}', phones[1]):
+    if PHONE_PATTERN.search(phones[1]):
         if phones[0] in contacts.get_record(key).phones_list:
-            ix = contacts.get_record(key).phones_list.index(phones[0])
-            if ix >= 0:
-                contacts.get_record(key).phones_list[ix] = phones[1]
+            owners = contacts.owners('phone', phones[1], exclude=key)
+            if owners:
+                raise CustomException(
+                    f'Phone number {phones[1]} already belongs to the contact "{owners[0]}"!')
+            contacts.get_record(key).change_phone(phones[0], phones[1])
             return f'Phone number for "{key}" has been successfully changed to {phones[1]}.'
         else:
             raise CustomException(
@@ -456,11 +781,7 @@ def add_note(command_line):
         для индексации по заметкам (редактирование, удаление, поиск)
     """
     note = ' '.join(command_line)
-    current_id = datetime.now()
-    # преобразовали в строку дату время создания
-    crt = current_id.strftime("%d.%m.%Y - %H:%M:%S")
-    with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "a+") as file:
-        file.write(crt+" :: "+note+"\n")  # первые 21 символ - строка
+    notes.add(note)
     return "The note is added."
 
 
@@ -474,7 +795,11 @@ def find_note(command_line):
         сейчас ограничиваем поиск датами, но не временем. Исключительно для удобства пользователя
         после вывода массива заметок он найдет интересующую, скопирует ее полный идентификатор и перейдет к ней
         непосредственно, если нужно
+
+        --limit N и --offset M выводят N заметок, пропустив первые M
     """
+    limit = pop_number(command_line, '--limit', 'notes')
+    offset = pop_number(command_line, '--offset', 'notes') or 0
     # разбираем команду в формат (keyword:str, start:'start date' = '', end:'end_date' = ''):
     if len(command_line) >= 3:
         keyword = command_line[0].lower()
@@ -497,40 +822,47 @@ def find_note(command_line):
         start_date = datetime.strptime(start, "%d.%m.%Y")
     except:
         print("Search start date is not stated in the DD.MM.YYYY format. The search will be performed from the first note.")
-        # начало поиска с даты начала Эпохи
-        start_date = datetime.strptime("01.01.1970", "%d.%m.%Y")
+        start_date = None
 
     try:
         end_date = datetime.strptime(end, "%d.%m.%Y")
     except:
         print("Search end date is not stated in the DD.MM.YYYY format. The search will be performed till the last note.")
-        end_date = datetime.now()   # конец поиска до текущего момента
+        end_date = None
 
     if (type(keyword) == str) and (keyword != ''):
         pass
     else:
         print("The keyword is not stated. The search will be performed for all notes.")
 
-    with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "r+") as file:
-        lines = file.readlines()  # список строк из файла заметок
-
-    msg = "No one note is found."
-    for i in lines:
-        date_id = i[:10]  # вырезали кусок строки - дата создание заметки
-        # конверт в объект, чтобы сравнивать
-        n_id = datetime.strptime(date_id, "%d.%m.%Y")
-        if (n_id >= start_date) and (n_id <= end_date):
-            if (type(keyword) == str) and (keyword != ''):
-                j = i.lower()      # приводим оригинальную строку к нижнеему регистру
-                # если есть ключ(нижний регистр) в строке (нижний регистр ) выводим оригинальную
-                if keyword in j:
-                    # забили последний символ переноса строки - для красивого вывода
-                    print(i[:len(i)-1])
-                    msg = "Notes are found."
-            else:
-                print(i[:len(i)-1])  # выводим все строки - нет ключа
-                msg = "Notes are found."
-    return msg
+    # заметки читаются по мере вывода, в памяти нет всего списка найденных
+    found = notes.find(keyword, start_date, end_date)
+    return render_notes(islice(found, offset, None if limit is None else offset + limit))
+
+
+def render_notes(found, chunk_size=RENDER_CHUNK_SIZE):
+    """Отдает найденные заметки частями по chunk_size строк и в конце итоговое сообщение."""
+    chunk = []
+    count = 0
+    for note in found:
+        chunk.append(f'{note}\n')
+        count += 1
+        if len(chunk) == chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+    yield "Notes are found." if count else "No one note is found."
+
+
+def parse_note_id(command_line):
+    """Собирает идентификатор заметки из трех первых слов команды."""
+    if len(command_line) >= 3:
+        dt_id = ' '.join(command_line[:3])
+        if is_note_id(dt_id):
+            return dt_id
+    print("The ID is not in the DD.MM.YYYY - hh.mm.ss format. Copy ID from the search results.")
+    return None
 
 
 @input_error
@@ -541,51 +873,19 @@ def change_note(command_line):
 
     """
     # разбираем команду в формат (dt_id:"%d.%m.%Y - %H:%M:%S" = '', data:str = '')
-    if len(command_line) >= 4:
-        dt_id = command_line[0]+' '+command_line[1]+' '+command_line[2]
-        command_line.pop(0)
-        command_line.pop(0)
-        command_line.pop(0)
-        data = ' '.join(command_line)
-    elif len(command_line) == 3:
-        dt_id = command_line[0]+command_line[1]+command_line[2]
-        data = ''
-    else:
-        dt_id = ''
-        data = ''
+    dt_id = parse_note_id(command_line)
+    data = ' '.join(command_line[3:])
 
     msg = "No one note is changed."
-    try:
-        # проверка что идентификатор задан в формате
-        loc_id = datetime.strptime(dt_id, "%d.%m.%Y - %H:%M:%S")
-        try:
-            with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "r") as file:
-                buffer = file.readlines()
-            for i in range(len(buffer)):
-                d_id = buffer[i][:21]  # полный идентификатор
-                n_id = datetime.strptime(d_id, "%d.%m.%Y - %H:%M:%S")
-                if n_id == loc_id:  # совпадение текущего ид с заданным
-                    if data != '':
-                        # замена строки, идентификатор остается
-                        buffer[i] = d_id+" :: "+data+"\n"
-                        msg = "The note is changed"
-                        break
-                    else:
-                        in_q = input(
-                            "The field for change is empty. Are you sure? y or n")
-                        if in_q == 'y':
-                            # замена строки, идентификатор остается
-                            buffer[i] = d_id+" :: "+data+"\n"
-                            msg = "The note is changed"
-                        break
-            # удаляем содержимое старого файла, пишем заново
-            with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "w") as file:
-                file.writelines(buffer)  # пишем построчно из буфера
-        except:
-            print("ID selection error. Maybe the reason is manual file editing.")
-
-    except:
-        print("The ID is not in the DD.MM.YYYY - hh.mm.ss format. Copy ID from the search results.")
+    if dt_id is None or dt_id not in notes:
+        return msg
+    if data == '':
+        in_q = input("The field for change is empty. Are you sure? y or n")
+        if in_q != 'y':
+            return msg
+    # новая версия дописывается в конец файла, старая помечается удаленной
+    if notes.replace(dt_id, data):
+        msg = "The note is changed"
     return msg
 
 
@@ -595,33 +895,12 @@ def delete_note(command_line):
        его удобно скопировать после общего поиска - вместе с кавычками
     """
     # разбираем команду в формат (dt_id:"%d.%m.%Y - %H:%M:%S" = '')
-    if len(command_line) == 3:
-        dt_id = command_line[0]+' '+command_line[1]+' '+command_line[2]
-    else:
-        dt_id = ''
+    dt_id = parse_note_id(command_line if len(command_line) == 3 else [])
 
     msg = "No one note is deleted"
-    try:
-        # проверка что идентификатор задан в формате
-        loc_id = datetime.strptime(dt_id, "%d.%m.%Y - %H:%M:%S")
-        try:
-            with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "r") as file:
-                buffer = file.readlines()
-            for i in range(len(buffer)):
-                d_id = buffer[i][:21]  # полный идентификатор
-                n_id = datetime.strptime(d_id, "%d.%m.%Y - %H:%M:%S")
-                if n_id == loc_id:  # совпадение текущего ид с заданным
-                    buffer.pop(i)
-                    msg = "The note is deleted"
-                    break
-            # удаляем содержимое старого файла, пишем заново
-            with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "w") as file:
-                file.writelines(buffer)  # пишем построчно из буфера
-        except:
-            print("ID selection error. Maybe the reason is manual file editing.")
-
-    except:
-        print("The ID is not in the DD.MM.YYYY - hh.mm.ss format. Copy ID from the search results.")
+    # строка заметки помечается удаленной на месте, файл не переписывается
+    if dt_id is not None and notes.delete(dt_id):
+        msg = "The note is deleted"
     return msg
 
 
@@ -631,53 +910,108 @@ def tag_note(command_line):
        обычной командой find note #....
     """
     # разбираем команду в формат (dt_id:"%d.%m.%Y - %H:%M:%S" = '', tag:str = '')
-    if len(command_line) >= 4:
-        dt_id = command_line[0] + ' ' + command_line[1] + ' ' + command_line[2]
-        tag = command_line[3]
-    elif len(command_line) == 3:
-        dt_id = command_line[0] + command_line[1] + command_line[2]
-        tag = ''
-    else:
-        dt_id = ''
-        tag = ''
+    dt_id = parse_note_id(command_line)
+    tag = command_line[3] if len(command_line) >= 4 else ''
 
     msg = "The hashtag is not acceptable."
+    if dt_id is None or dt_id not in notes:
+        return msg
+    if tag == '':
+        in_q = input("The tag is empty. Are you sure? y or n")
+        if in_q != 'y':
+            return msg
+    if notes.add_tag(dt_id, tag):
+        msg = "The hashtag is accepted."
+    return msg
+
+
+@input_error
+def find_tag(command_line):
+    """Поиск заметок по тегам с операторами AND, OR и NOT отвечает по индексу тегов,
+       из файла читаются только найденные заметки.
+       Без аргументов выводит все теги с количеством заметок
+    """
+    if not command_line:
+        tags = notes.tag_counts()
+        if not tags:
+            return "No one tag is found."
+        return '\n'.join(f'#{tag} ({count})' for tag, count in tags)
+
     try:
-        # проверка что идентификатор задан в формате
-        loc_id = datetime.strptime(dt_id, "%d.%m.%Y - %H:%M:%S")
-        try:
-            with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "r") as file:
-                buffer = file.readlines()
-            for i in range(len(buffer)):
-                d_id = buffer[i][:21]  # полный идентификатор
-                n_id = datetime.strptime(d_id, "%d.%m.%Y - %H:%M:%S")
-                if n_id == loc_id:  # совпадение текущего ид с заданным
-                    if tag != '':
-                        # забили перенос строки, добавили хештег и перенос
-                        j = buffer[i][:len(buffer[i])-1] + '  #' + tag + '\n'
-                        # строка неизменяема, нельзя сразу писать buffer[i] = buffer[i] + tag
-                        buffer[i] = j
-                        msg = "The hashtag is accepted."
-                        break
-                    else:
-                        in_q = input("The tag is empty. Are you sure? y or n")
-                        if in_q == 'y':
-                            # забили перенос строки, добавили хештег и перенос
-                            j = buffer[i][:len(buffer[i])-1] + \
-                                '  #' + tag + '\n'
-                            # строка неизменяема, нельзя сразу писать buffer[i] = buffer[i] + tag
-                            buffer[i] = j
-                            msg = "The hashtag is accepted."
-                        break
-            # удаляем содержимое старого файла, пишем заново
-            with open(f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", "w") as file:
-                file.writelines(buffer)  # пишем построчно из буфера
-        except:
-            print("ID selection error. Maybe the reason is manual file editing.")
+        ids = notes.find_tags(command_line)
+    except ValueError as error:
+        raise CustomException(str(error))
+    return render_notes(map(notes.get, ids))
 
-    except:
-        print("The ID is not in the DD.MM.YYYY - hh.mm.ss format. Copy ID from the search results.")
-    return msg
+
+@input_error
+def find_text(command_line):
+    """Полнотекстовый поиск по заметкам, результаты отсортированы по релевантности (BM25).
+       Слова в двойных кавычках ищутся как фраза
+    """
+    limit = pop_number(command_line, '--limit', 'notes')
+    if not command_line:
+        return "Specify the words to search."
+    found = notes.search_text(' '.join(command_line), limit)
+    return render_notes(note for score, note in found)
+
+
+@input_error
+def rebuild_notes(command_line):
+    """Перестраивает все индексы заметок, например после ручного редактирования файла."""
+    count = notes.rebuild_all()
+    return f"The notes indexes are rebuilt, {count} notes are indexed."
+
+
+@input_error
+def import_notes(command_line):
+    """Каждая непустая строка файла - отдельная заметка, теги можно указать в конце строки
+       в формате '  #tag'. Все правильные заметки записываются в файл одной записью,
+       вместо имени файла можно указать '-' для чтения заметок из стандартного ввода
+    """
+    file_name = ' '.join(command_line)
+    if not file_name:
+        raise CustomException('Specify the file with notes (Format: import notes <file>).')
+    if file_name != '-' and not os.path.exists(file_name):
+        raise CustomException(f'There is no file {file_name}.')
+
+    valid = []
+    errors = []
+    # Стандартный ввод читается через sys.stdin: его буфер уже может содержать следующие строки
+    with (open(file_name, 'rb') if file_name != '-' else contextlib.nullcontext(sys.stdin)) as fh:
+        for line, text, tags, error in read_notes(fh):
+            if error:
+                errors.append(f'Line {line}: {error}')
+            else:
+                valid.append((text, tags))
+    notes.add_many(valid)
+    for error in errors[:IMPORT_ERRORS_SHOWN]:
+        print(error)
+    if len(errors) > IMPORT_ERRORS_SHOWN:
+        print(f'... and {len(errors) - IMPORT_ERRORS_SHOWN} more errors.')
+    return f'{len(valid)} notes are imported, {len(errors)} lines are skipped because of errors.'
+
+
+@input_error
+def archive_notes(command_line):
+    """Переносит заметки, созданные раньше чем N месяцев назад (по умолчанию ARCHIVE_MONTHS),
+       в сжатые файлы по месяцам. find note продолжает их находить
+    """
+    if command_line and not command_line[0].isdigit():
+        raise CustomException('The number of months must be a number (Format: archive notes [months]).')
+    months = int(command_line[0]) if command_line else ARCHIVE_MONTHS
+    today = date.today()
+    # первый день месяца, который был months месяцев назад
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    count = notes.archive_before(date(year, month + 1, 1))
+    return f"{count} notes created before 01.{month + 1:02d}.{year} are archived."
+
+
+@input_error
+def compact_notes(command_line):
+    """Переписывает файл заметок без удаленных и старых версий строк."""
+    removed = notes.compact()
+    return f"The notes file is compacted, {removed} outdated lines are removed."
 
 
 @input_error
@@ -699,30 +1033,117 @@ def help_common(command_line):
 
 def start_note():  # проверка что файл существует или его создание
 
-    try:
-        file = open(
-            f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", 'r')
-        print("File note.txt with notes is loaded.")
-    except:
-        # создаем новый
-        file = open(
-            f"{os.path.dirname(os.path.abspath(__file__))}/note.txt", 'w')
+    if notes.create():
         print("File note.txt with notes is created.")
-    finally:
-        file.close()
+    else:
+        print("File note.txt with notes is loaded.")
 
 
 @input_error
 def show_all(command_line):
 
-    if len(contacts.items()) > 0:
-        return str(contacts)
-    else:
+    if len(contacts.items()) == 0:
         return 'There are no contacts in the book.'
+    if not command_line:
+        # Вся книга выводится по частям, по мере отрисовки записей
+        return contacts.render()
+    if not all(value.isdigit() and int(value) > 0 for value in command_line[:2]):
+        raise CustomException(
+            'The page number and the page size must be positive numbers (Format: show all [page] [size]).')
+    number = int(command_line[0])
+    size = int(command_line[1]) if len(command_line) > 1 else PAGE_SIZE
+    pages = (len(contacts) + size - 1) // size
+    if number > pages:
+        return f'There is no page {number}. The contacts book has {pages} pages of {size} contacts.'
+    return chain(contacts.page(number, size), [f'\nPage {number} of {pages}.'])
+
+
+def format_phone(phone):
+    # Телефоны из других систем приводятся к формату (0XX)XXX-XX-XX
+    match = PHONE_PATTERN.search(phone)
+    if match:
+        return match.group()
+    digits = NON_DIGITS.sub('', phone)
+    if len(digits) == 12 and digits.startswith('380'):
+        digits = digits[2:]
+    if len(digits) == 10 and digits.startswith('0'):
+        return unpack_phone(int(digits))
+    raise CustomException(f'Wrong phone number format {phone}! Use (0XX)XXX-XX-XX format!')
+
+
+def record_from_import(state, batch_phones):
+    name = ' '.join(state['name'].split())
+    if not name:
+        raise CustomException('The name is empty.')
+    phones = []
+    for phone in state['phones']:
+        phone = format_phone(phone)
+        owners = contacts.owners('phone', phone, exclude=name)
+        owner = owners[0] if owners else batch_phones.get(phone, name)
+        if owner != name:
+            raise CustomException(f'Phone number {phone} already belongs to the contact "{owner}"!')
+        if phone not in phones:
+            phones.append(phone)
+    if state['email'] and not EMAIL_PATTERN.search(state['email']):
+        raise CustomException(f'Wrong email format {state["email"]}! Correct format is aaaa@ddd.cc')
+    if state['birthday']:
+        try:
+            parse_date(state['birthday'])
+        except ValueError:
+            raise CustomException(
+                f'Wrong date of birth {state["birthday"]}! Correct format is DD.MM.YYYY')
+    for phone in phones:
+        batch_phones[phone] = name
+    return Record(name, state['address'], phones, state['email'], state['birthday'])
+
+
+@input_error
+def import_func(command_line):
+    """Строки файла проверяются по одной, неправильные строки выводятся и пропускаются.
+       Все правильные контакты добавляются в книгу разом после чтения всего файла,
+       контакты с существующими именами заменяются
+    """
+    file_name = ' '.join(command_line)
+    if not file_name:
+        raise CustomException('Specify the CSV or vCard file (Format: import <file>).')
+    if not os.path.exists(file_name):
+        raise CustomException(f'There is no file {file_name}.')
+    from . import contacts_io
+
+    records = {}
+    batch_phones = {}
+    errors = []
+    for line, state in contacts_io.read_contacts(file_name):
+        try:
+            record = record_from_import(state, batch_phones)
+            records[record.name] = record
+        except CustomException as error:
+            errors.append(f'Line {line}: {error.txt}')
+    updated = sum(1 for name in records if name in contacts)
+    contacts.add_records(records.values())
+    for error in errors[:IMPORT_ERRORS_SHOWN]:
+        print(error)
+    if len(errors) > IMPORT_ERRORS_SHOWN:
+        print(f'... and {len(errors) - IMPORT_ERRORS_SHOWN} more errors.')
+    return (f'{len(records) - updated} contacts are added, {updated} contacts are updated, '
+            f'{len(errors)} rows are skipped because of errors.')
+
+
+@input_error
+def export_func(command_line):
+    file_name = ' '.join(command_line)
+    if not file_name:
+        raise CustomException('Specify the CSV or vCard file (Format: export <file>).')
+    from . import contacts_io
+
+    count = contacts_io.write_contacts(file_name, contacts.iter_states())
+    return f'{count} contacts are exported to the file "{file_name}".'
 
 
 @input_error
 def clean_func(command_line):
+    from . import clean
+
     return clean.start_cleaning(command_line)
 
 
@@ -748,44 +1169,120 @@ COMMANDS = {
     'coming birthday': coming_birthday,
     "add note": add_note,
     "find note": find_note,
+    "find tag": find_tag,
+    "find text": find_text,
     "change note": change_note,
     "delete note": delete_note,
     "tag note": tag_note,
+    "compact notes": compact_notes,
+    "archive notes": archive_notes,
+    "import notes": import_notes,
+    "rebuild notes": rebuild_notes,
     "help": help_common,
     'show all': show_all,
     'search': search,
-    'clean': clean_func
+    'find phone': find_phone,
+    'find email': find_email,
+    'clean': clean_func,
+    'import': import_func,
+    'export': export_func
 }
 
 ONE_WORD_COMMANDS = ['add', 'clean', 'close', "help",
-                     'exit', 'save', 'remove', 'search']
+                     'exit', 'save', 'remove', 'search', 'import', 'export']
 TWO_WORDS_COMMANDS = ['add address', 'add birthday', 'add email', 'add phone',
                       'delete address', 'delete birthday', 'delete email', 'delete phone',
                       'change email', 'change birthday', 'change address', 'change phone',
-                      'coming birthday', 'good bye', "add note", "find note", "change note",
-                      "delete note", "tag note", 'show all']
+                      'coming birthday', 'good bye', "add note", "find note", "find tag", "find text",
+                      "change note", "delete note", "tag note", "compact notes", "rebuild notes",
+                      "import notes", "archive notes", 'show all', 'find phone', 'find email']
 
 
 def get_handler(command):
     return COMMANDS[command]
 
 
+def print_result(result):
+    if isinstance(result, Iterator):
+        # Длинный вывод печатается частями, не дожидаясь отрисовки всех записей
+        for chunk in result:
+            print(chunk, end='', flush=True)
+        print()
+    else:
+        print(result)
+
+
+# Команды, которым нужна загруженная книга контактов
+CONTACTS_COMMANDS = {'add', 'add address', 'add birthday', 'add email', 'add phone',
+                     'delete address', 'delete birthday', 'delete email', 'delete phone',
+                     'change email', 'change birthday', 'change address', 'change phone',
+                     'coming birthday', 'remove', 'save', 'search', 'show all',
+                     'find phone', 'find email', 'import', 'export'}
+
+contacts_loading = {}
+
+
+def start_loading_contacts():
+    """Загружает книгу контактов в фоновом потоке, чтобы первое приглашение
+       появлялось, не дожидаясь загрузки большой книги
+    """
+    def load():
+        try:
+            contacts_loading['message'] = contacts.load_from_file(CONTACTS_FILE)
+        except Exception as exc:
+            contacts_loading['error'] = exc
+
+    contacts_loading['thread'] = threading.Thread(target=load, daemon=True)
+    contacts_loading['thread'].start()
+
+
+def wait_contacts():
+    """Ждет окончания загрузки книги контактов. Сообщение о загрузке возвращается
+       только при первом вызове
+    """
+    thread = contacts_loading.pop('thread', None)
+    if thread is None:
+        return None
+    thread.join()
+    if 'error' in contacts_loading:
+        raise contacts_loading.pop('error')
+    return contacts_loading.pop('message')
+
+
+def measure_startup():
+    started = time.perf_counter()
+    start_note()
+    start_loading_contacts()
+    ready = time.perf_counter()
+    from prompt_toolkit import prompt
+    get_prompt_options()
+    prompt_ready = time.perf_counter()
+    wait_contacts()
+    loaded = time.perf_counter()
+    print(f'Module import:           {(started - IMPORT_STARTED) * 1000:.1f} ms')
+    print(f'Ready for commands:      {(ready - IMPORT_STARTED) * 1000:.1f} ms')
+    print(f'Prompt Toolkit imported: {(prompt_ready - IMPORT_STARTED) * 1000:.1f} ms')
+    print(f'Contacts book loaded:    {(loaded - IMPORT_STARTED) * 1000:.1f} ms ({len(contacts)} contacts)')
+
+
 def main():
 
+    if '--startup-time' in sys.argv[1:]:
+        measure_startup()
+        return
+
     print("Enter 'help' command to see all the commands available.")
     start_note()
-    print(contacts.load_from_file(
-        f"{os.path.dirname(os.path.abspath(__file__))}/contacts.bin"))
+    start_loading_contacts()
 
     while True:
         command_line = []
         while not command_line:
-            command_line = prompt('>>> ',
-                                  history=FileHistory('history'),
-                                  auto_suggest=AutoSuggestFromHistory(),
-                                  completer=SqlCompleter,
-                                  style=style
-                                  ).split()
+            try:
+                command_line = read_command().split()
+            except EOFError:
+                # Конец ввода равнозначен команде exit
+                command_line = ['exit']
 
         right_command = False
 
@@ -804,10 +1301,15 @@ def main():
             continue
 
         handler = get_handler(command)
-        print(handler(command_line))
+        if command in CONTACTS_COMMANDS:
+            message = wait_contacts()
+            if message:
+                print(message)
+        print_result(handler(command_line))
         if handler is exit_func:
-            print(contacts.save_to_file(
-                f"{os.path.dirname(os.path.abspath(__file__))}/contacts.bin"))
+            wait_contacts()
+            notes.save_index()
+            print(contacts.save_to_file(CONTACTS_FILE))
             break
 
 
@@ -0,0 +1,238 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import os
+import pickle
+
+
+# Журнал не сворачивается в снимок, пока он меньше этого размера
+COMPACT_MIN_SIZE = 1 << 16
+# Сколько последних использованных записей держит в памяти SQLite-хранилище
+SQLITE_CACHE_SIZE = 1024
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+
+def open_storage(file_name):
+    if file_name.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteStorage(file_name)
+    return JournalStorage(file_name)
+
+
+class JournalStorage:
+    """Contacts storage made of a pickled snapshot and an append-only journal.
+
+       The snapshot (file_name) is a pickled {name: Record} dict, the same
+       format the contacts book has always been saved in. Every save appends
+       only the records changed since the previous save to file_name.journal,
+       so the cost of saving depends on the size of the change, not on the
+       size of the book. When the journal outgrows the snapshot, both are
+       folded into a fresh snapshot.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.journal_name = f'{file_name}.journal'
+        self.dirty = set()
+
+    def touch(self, name, record=None):
+        self.dirty.add(name)
+
+    def load(self, book):
+        data = {}
+        if os.path.exists(self.file_name):
+            with open(self.file_name, 'rb') as fh:
+                data = pickle.load(fh)
+        for op, name, record in self._replay():
+            if op == 'put':
+                data[name] = record
+            else:
+                data.pop(name, None)
+        for record in data.values():
+            book._attach(record)
+        self.dirty.clear()
+        return data
+
+    def _replay(self):
+        if not os.path.exists(self.journal_name):
+            return
+        with open(self.journal_name, 'r+b') as fh:
+            # Смещение конца последней целой записи
+            good_end = 0
+            while True:
+                try:
+                    entry = pickle.load(fh)
+                except Exception:
+                    # Конец журнала или оборванная запись в конце (например, после сбоя)
+                    break
+                good_end = fh.tell()
+                yield entry
+            if good_end < os.fstat(fh.fileno()).st_size:
+                # Оборванная запись отрезается, иначе следующие сохранения дописались бы после нее
+                fh.truncate(good_end)
+
+    def save(self, data):
+        if self.dirty:
+            with open(self.journal_name, 'ab') as fh:
+                for name in self.dirty:
+                    if name in data:
+                        pickle.dump(('put', name, data[name]), fh)
+                    else:
+                        pickle.dump(('remove', name, None), fh)
+            self.dirty.clear()
+        if self._journal_size() > max(self._snapshot_size(), COMPACT_MIN_SIZE):
+            self.compact(data)
+
+    def compact(self, data):
+        tmp_name = f'{self.file_name}.tmp'
+        with open(tmp_name, 'wb') as fh:
+            pickle.dump(dict(data), fh)
+        os.replace(tmp_name, self.file_name)
+        if os.path.exists(self.journal_name):
+            os.remove(self.journal_name)
+        self.dirty.clear()
+
+    def _snapshot_size(self):
+        return os.path.getsize(self.file_name) if os.path.exists(self.file_name) else 0
+
+    def _journal_size(self):
+        return os.path.getsize(self.journal_name) if os.path.exists(self.journal_name) else 0
+
+
+class SQLiteRecords(MutableMapping):
+    """{name: Record} mapping over the contacts table of an SQLite file.
+
+       Records are built only when they are requested and the most recently
+       used ones are kept in an LRU cache. Changed records stay in the cache
+       until they are written back on eviction or on flush().
+    """
+
+    def __init__(self, connection, book, cache_size=SQLITE_CACHE_SIZE):
+        self.connection = connection
+        self.book = book
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.dirty = set()
+
+    def __getitem__(self, name):
+        if name in self.cache:
+            self.cache.move_to_end(name)
+            return self.cache[name]
+        row = self.connection.execute(
+            'SELECT name, address, phones, email, birthday FROM contacts WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        record = self.book._materialize(row_to_state(row))
+        self._cache(name, record)
+        return record
+
+    def __setitem__(self, name, record):
+        self._cache(name, record)
+        self.dirty.add(name)
+
+    def __delitem__(self, name):
+        cached = self.cache.pop(name, None)
+        self.dirty.discard(name)
+        cursor = self.connection.execute(
+            'DELETE FROM contacts WHERE name = ?', (name,))
+        if cached is None and cursor.rowcount == 0:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        if name in self.cache:
+            return True
+        return self.connection.execute(
+            'SELECT 1 FROM contacts WHERE name = ?', (name,)).fetchone() is not None
+
+    def __iter__(self):
+        self.flush()
+        for (name,) in self.connection.execute('SELECT name FROM contacts'):
+            yield name
+
+    def __len__(self):
+        self.flush()
+        return self.connection.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+    def states(self):
+        self.flush()
+        for row in self.connection.execute('SELECT name, address, phones, email, birthday FROM contacts'):
+            yield row_to_state(row)
+
+    def mark_dirty(self, name, record=None):
+        if record is not None and self.cache.get(name) is not record:
+            # Запись уже вытеснена из кэша, но ее изменил тот, кто ее держит
+            self._cache(name, record)
+        if name in self.cache:
+            self.dirty.add(name)
+
+    def flush(self):
+        if self.dirty:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?, ?)',
+                [state_to_row(self.cache[name].to_state()) for name in self.dirty])
+            self.dirty.clear()
+
+    def _cache(self, name, record):
+        self.cache[name] = record
+        self.cache.move_to_end(name)
+        while len(self.cache) > self.cache_size:
+            old_name, old_record = self.cache.popitem(last=False)
+            if old_name in self.dirty:
+                # Измененная запись записывается в базу перед вытеснением из кэша
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO contacts VALUES (?, ?, ?, ?, ?)',
+                    state_to_row(old_record.to_state()))
+                self.dirty.discard(old_name)
+
+
+class SQLiteStorage:
+    """Contacts storage in a local SQLite file with lazy record loading.
+
+       Opening the book costs only a connection, records are read on demand
+       through SQLiteRecords. Saving writes back the changed records and
+       commits the transaction.
+    """
+
+    def __init__(self, file_name):
+        # sqlite3 нужен только этому хранилищу, поэтому импортируется здесь
+        import sqlite3
+
+        self.file_name = file_name
+        # Книга может быть загружена в одном потоке, а использоваться в другом
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS contacts ('
+                                'name TEXT PRIMARY KEY, address TEXT, phones TEXT, '
+                                'email TEXT, birthday TEXT)')
+        self.records = None
+
+    def touch(self, name, record=None):
+        if self.records is not None:
+            self.records.mark_dirty(name, record)
+
+    def load(self, book):
+        self.records = SQLiteRecords(self.connection, book)
+        return self.records
+
+    def save(self, data):
+        self.records.flush()
+        self.connection.commit()
+
+    def compact(self, data):
+        if data is self.records:
+            self.records.flush()
+        else:
+            self.connection.execute('DELETE FROM contacts')
+            self.connection.executemany(
+                'INSERT INTO contacts VALUES (?, ?, ?, ?, ?)',
+                (state_to_row(record.to_state()) for record in data.values()))
+        self.connection.commit()
+        self.connection.execute('VACUUM')
+
+
+def row_to_state(row):
+    name, address, phones, email, birthday = row
+    return {'name': name, 'address': address, 'phones': phones.split(',') if phones else [],
+            'email': email, 'birthday': birthday}
+
+
+def state_to_row(state):
+    return (state['name'], state['address'], ','.join(state['phones']),
+            state['email'], state['birthday'])